@@ -21,6 +21,7 @@ from sqlalchemy.orm import Session
 
 from backend.core.db import get_db
 from backend.core.config import settings
+from backend.core.events import CLAIMS_CHANNEL, notify
 
 API_ID = settings.TELEGRAM_API_ID
 API_HASH = settings.TELEGRAM_API_HASH
@@ -1283,6 +1284,9 @@ async def _finish_login(login_id: str, db: Session) -> HTMLResponse:
     # 3️⃣ META
     user.last_seen_at = now  # ✅ claim/stale logika uchun foydali
 
+    # 4️⃣ Workerlarga darhol xabar (commit’dan keyin yetib boradi)
+    notify(db, CLAIMS_CHANNEL, telegram_id=user.telegram_id, reason="login")
+
     db.commit()
 
     body = """
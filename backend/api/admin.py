@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta
-from typing import List
-from sqlalchemy import text
+from typing import Iterator, List, Optional, Tuple
+import base64
+import json
+
+from sqlalchemy import text, tuple_
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 import httpx
 from backend.core.config import settings
-from backend.core.db import get_db
+from backend.core.db import SessionLocal, get_db
+from backend.core.events import notify_user_state
 from backend.models.user import User, PlanEnum
 from backend.models.admin import Admin
 
@@ -48,6 +53,85 @@ def require_admin(telegram_id: int, db: Session) -> Admin:
     return admin
 
 
+# ---- keyset pagination on (created_at, id) ----
+
+USERS_PAGE_MAX = 100
+USERS_STREAM_PAGE = 1000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    """Opaque + short (bot callback_data is limited to 64 bytes)."""
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    raw = f"{micros:x}.{user_id:x}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        micros, user_id = raw.split(".")
+        return _EPOCH + timedelta(microseconds=int(micros, 16)), int(user_id, 16)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _user_cursor(u: User) -> str:
+    return encode_cursor(u.created_at, u.id)
+
+
+def _users_page(db: Session, limit: int, cursor: Optional[str], backward: bool = False):
+    """
+    One keyset page, newest first. backward=True walks towards newer
+    users (the "previous" page). Returns (users, has_more_in_direction).
+    """
+    key = tuple_(User.created_at, User.id)
+    query = db.query(User)
+
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        bound = tuple_(created_at, user_id)
+        query = query.filter(key > bound if backward else key < bound)
+
+    if backward:
+        query = query.order_by(User.created_at.asc(), User.id.asc())
+    else:
+        query = query.order_by(User.created_at.desc(), User.id.desc())
+
+    users = query.limit(limit + 1).all()
+    has_more = len(users) > limit
+    users = users[:limit]
+    if backward:
+        users.reverse()
+    return users, has_more
+
+
+def estimated_user_count(db: Session) -> int:
+    """pg_class.reltuples: free, refreshed by (auto)ANALYZE. -1/0 → never analyzed."""
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+    ).scalar()
+    if estimate is None or estimate <= 0:
+        return db.query(User).count()
+    return estimate
+
+
+def _user_item(u: User) -> dict:
+    return {
+        "telegram_id": u.telegram_id,
+        "name": u.name or "not provided",
+        "username": f"@{u.username}" if u.username else "not provided",
+        "phone": u.phone or "not provided",
+        "plan": u.plan.value,
+        "plan_expires_at": u.plan_expires_at,
+        "created_at": u.created_at,
+        "worker_active": bool(u.worker_active),
+        "last_seen_at": u.last_seen_at,
+        "trigger_count": u.trigger_count,
+        "is_registered": bool(u.is_registered),
+    }
+
+
 # ============================
 #        ADMINS
 # ============================
@@ -76,6 +160,7 @@ def add_admin(
             raise HTTPException(status_code=409, detail="Admin already exists")
         exists.is_active = True
         exists.created_at = datetime.utcnow()
+        notify_user_state(db, [new_admin_telegram_id], reason="admin")
         db.commit()
         return {"detail": "Admin re-activated"}
 
@@ -85,6 +170,7 @@ def add_admin(
         created_at=datetime.utcnow(),
     )
     db.add(admin)
+    notify_user_state(db, [new_admin_telegram_id], reason="admin")
     db.commit()
     return {"detail": "Admin added"}
 
@@ -102,6 +188,7 @@ def remove_admin(
         raise HTTPException(status_code=404, detail="Admin not found")
 
     admin.is_active = False
+    notify_user_state(db, [admin_telegram_id], reason="admin")
     db.commit()
     return {"detail": "Admin removed"}
 
@@ -130,6 +217,39 @@ def users_stats(
     }
 
 
+@router.get("/users/stream")
+def stream_admin_users(
+    requester_telegram_id: int,
+    only_ids: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    NDJSON: one user per line, newest first. Pages through the keyset
+    index USERS_STREAM_PAGE rows at a time, so memory stays constant on
+    both ends no matter how many users there are.
+    """
+    require_admin(requester_telegram_id, db)
+
+    def _lines() -> Iterator[str]:
+        # stream response dependency session’dan uzoq yashaydi → o‘zimizniki
+        session = SessionLocal()
+        try:
+            cursor = None
+            while True:
+                users, has_more = _users_page(session, USERS_STREAM_PAGE, cursor)
+                for u in users:
+                    item = {"telegram_id": u.telegram_id} if only_ids else _user_item(u)
+                    yield json.dumps(item, default=str) + "\n"
+                if not has_more:
+                    return
+                cursor = _user_cursor(users[-1])
+                session.expunge_all()
+        finally:
+            session.close()
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
 @router.get("/users/{telegram_id}")
 def get_user_by_telegram_id(
     telegram_id: int,
@@ -173,6 +293,7 @@ def gift_user_plan(
 
     user.plan = payload.plan
     user.plan_expires_at = expires_at
+    notify_user_state(db, [user.telegram_id], reason="plan")
     db.commit()
 
     # ============================
@@ -241,39 +362,42 @@ def check_admin(
 def get_admin_users(
     requester_telegram_id: int,
     limit: int = 10,
-    offset: int = 0,
+    cursor: Optional[str] = None,
+    direction: str = "next",
+    exact_total: bool = False,
     db: Session = Depends(get_db),
 ):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    cursor: next_cursor / prev_cursor of a previous response (opaque).
+    total: pg_class.reltuples estimate unless exact_total=true.
+    """
     require_admin(requester_telegram_id, db)
 
-    query = db.query(User).order_by(User.created_at.desc())
+    if direction not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="direction must be next or prev")
+    if direction == "prev" and not cursor:
+        raise HTTPException(status_code=400, detail="prev needs a cursor")
 
-    total = query.count()
+    limit = max(1, min(limit, USERS_PAGE_MAX))
+    backward = direction == "prev"
+    users, has_more = _users_page(db, limit, cursor, backward=backward)
 
-    users = (
-        query
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    if backward:
+        # orqaga yurdik → keyingi sahifa albatta bor
+        prev_cursor = _user_cursor(users[0]) if users and has_more else None
+        next_cursor = _user_cursor(users[-1]) if users else cursor
+    else:
+        prev_cursor = _user_cursor(users[0]) if users and cursor else None
+        next_cursor = _user_cursor(users[-1]) if users and has_more else None
 
-    items = []
-    for u in users:
-        items.append({
-            "telegram_id": u.telegram_id,
-            "name": u.name or "not provided",
-            "username": f"@{u.username}" if u.username else "not provided",
-            "phone": u.phone or "not provided",
-            "plan": u.plan.value,
-            "plan_expires_at": u.plan_expires_at,
-            "created_at": u.created_at,
-            "worker_active": bool(u.worker_active),
-            "last_seen_at": u.last_seen_at,
-            "trigger_count": u.trigger_count,
-            "is_registered": bool(u.is_registered),
-        })
+    total = db.query(User).count() if exact_total else estimated_user_count(db)
 
     return {
         "total": total,
-        "items": items,
-    }
\ No newline at end of file
+        "total_is_estimate": not exact_total,
+        "items": [_user_item(u) for u in users],
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
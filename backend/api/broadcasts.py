@@ -0,0 +1,304 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    SmallInteger,
+    String,
+    and_,
+    case,
+    column,
+    exists,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.api.admin import require_admin
+from backend.core.db import get_db, get_async_db
+from backend.core.deps import get_worker_id
+from backend.models.broadcast import BroadcastJob, BroadcastRecipient
+from backend.models.user import User
+
+router = APIRouter(prefix="/broadcasts", tags=["broadcasts"])
+
+# runner shu vaqt ichida results yubormasa, job boshqa bot process’ga o‘tadi
+BROADCAST_LEASE_TTL = timedelta(seconds=60)
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def _job_json(job: BroadcastJob, with_text: bool = False) -> dict:
+    data = {
+        "id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "sent": job.sent_count,
+        "failed": job.failed_count,
+        "blocked": job.blocked_count,
+        "pending": max(job.total - job.sent_count - job.failed_count - job.blocked_count, 0),
+        "progress_chat_id": job.progress_chat_id,
+        "progress_message_id": job.progress_message_id,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if with_text:
+        data["text"] = job.text
+    return data
+
+
+# =========================
+# Admin side (bot handlers)
+# =========================
+
+class BroadcastCreate(BaseModel):
+    requester_telegram_id: int
+    text: str
+    progress_chat_id: Optional[int] = None
+    progress_message_id: Optional[int] = None
+
+
+class BroadcastCancel(BaseModel):
+    requester_telegram_id: int
+
+
+@router.post("")
+def create_broadcast(payload: BroadcastCreate, db: Session = Depends(get_db)):
+    """
+    Snapshots every user into broadcast_recipients with ONE
+    INSERT ... SELECT, so the job's audience never changes mid-run and
+    no user list crosses the wire.
+    """
+    require_admin(payload.requester_telegram_id, db)
+
+    if not payload.text.strip():
+        raise HTTPException(status_code=400, detail="Broadcast text is empty")
+
+    job = BroadcastJob(
+        created_by=payload.requester_telegram_id,
+        text=payload.text,
+        status="pending",
+        progress_chat_id=payload.progress_chat_id,
+        progress_message_id=payload.progress_message_id,
+    )
+    db.add(job)
+    db.flush()
+
+    result = db.execute(
+        insert(BroadcastRecipient).from_select(
+            ["job_id", "telegram_id"],
+            select(literal(job.id, Integer), User.telegram_id),
+        )
+    )
+    job.total = result.rowcount
+    if not job.total:
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+
+    db.commit()
+    db.refresh(job)
+    return _job_json(job)
+
+
+@router.get("/{job_id}")
+def get_broadcast(job_id: int, requester_telegram_id: int, db: Session = Depends(get_db)):
+    require_admin(requester_telegram_id, db)
+
+    job = db.get(BroadcastJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return _job_json(job)
+
+
+@router.post("/{job_id}/cancel")
+def cancel_broadcast(job_id: int, payload: BroadcastCancel, db: Session = Depends(get_db)):
+    require_admin(payload.requester_telegram_id, db)
+
+    job = db.query(BroadcastJob).filter(BroadcastJob.id == job_id).with_for_update().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+
+    # runner keyingi results flush’da "cancelled"ni ko‘rib to‘xtaydi
+    if job.status in ACTIVE_STATUSES:
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+    return _job_json(job)
+
+
+# =========================
+# Runner side (bot broadcast runner)
+# =========================
+
+@router.post("/claim")
+async def claim_broadcast(
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Leases the oldest active job whose lease is free, expired or
+    already ours — a restarted bot picks its unfinished job back up.
+    """
+    now = datetime.utcnow()
+
+    job = (
+        await db.execute(
+            select(BroadcastJob)
+            .where(
+                BroadcastJob.status.in_(ACTIVE_STATUSES),
+                or_(
+                    BroadcastJob.runner_id.is_(None),
+                    BroadcastJob.runner_id == worker_id,
+                    BroadcastJob.lease_until < now,
+                ),
+            )
+            .order_by(BroadcastJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+    ).scalars().first()
+
+    if not job:
+        return None
+
+    job.runner_id = worker_id
+    job.lease_until = now + BROADCAST_LEASE_TTL
+    job.status = "running"
+    job.started_at = job.started_at or now
+    await db.commit()
+
+    return _job_json(job, with_text=True)
+
+
+@router.get("/{job_id}/pending")
+async def list_pending_recipients(
+    job_id: int,
+    after: int = 0,
+    limit: int = 500,
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Keyset page over ix_broadcast_recipients_pending."""
+    limit = max(1, min(limit, 2000))
+    rows = (
+        await db.execute(
+            select(BroadcastRecipient.telegram_id)
+            .where(
+                BroadcastRecipient.job_id == job_id,
+                BroadcastRecipient.status == "pending",
+                BroadcastRecipient.telegram_id > after,
+            )
+            .order_by(BroadcastRecipient.telegram_id)
+            .limit(limit)
+        )
+    ).scalars().all()
+    return list(rows)
+
+
+class RecipientResult(BaseModel):
+    telegram_id: int
+    status: Literal["sent", "failed", "blocked"]
+    attempts: int = 1
+    error: Optional[str] = None
+
+
+class BroadcastResults(BaseModel):
+    results: List[RecipientResult] = []
+    # runner pending ro‘yxatini oxirigacha o‘qib chiqdi
+    exhausted: bool = False
+
+
+@router.post("/{job_id}/results")
+async def report_broadcast_results(
+    job_id: int,
+    data: BroadcastResults,
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Runner flush: final per-recipient outcomes in ONE UPDATE ... FROM
+    (VALUES ...), counters bumped by what actually changed (a replayed
+    flush is a no-op). Doubles as the lease heartbeat; the returned
+    status tells the runner to stop on cancel.
+    """
+    now = datetime.utcnow()
+
+    job = (
+        await db.execute(
+            select(BroadcastJob).where(BroadcastJob.id == job_id).with_for_update()
+        )
+    ).scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    if job.runner_id != worker_id:
+        raise HTTPException(status_code=409, detail="Broadcast lease lost")
+
+    if data.results:
+        rows = values(
+            column("telegram_id", BigInteger),
+            column("status", String),
+            column("attempts", SmallInteger),
+            column("error", String),
+            name="results",
+        ).data([
+            (r.telegram_id, r.status, r.attempts, (r.error or "")[:255] or None)
+            for r in data.results
+        ])
+
+        changed = (
+            await db.execute(
+                update(BroadcastRecipient)
+                .where(
+                    BroadcastRecipient.job_id == job_id,
+                    BroadcastRecipient.telegram_id == rows.c.telegram_id,
+                    BroadcastRecipient.status == "pending",
+                )
+                .values(
+                    status=rows.c.status,
+                    attempts=rows.c.attempts,
+                    error=rows.c.error,
+                    sent_at=case((rows.c.status == "sent", literal(now)), else_=None),
+                )
+                .returning(BroadcastRecipient.status)
+                .execution_options(synchronize_session=False)
+            )
+        ).scalars().all()
+
+        counts = Counter(changed)
+        job.sent_count += counts["sent"]
+        job.failed_count += counts["failed"]
+        job.blocked_count += counts["blocked"]
+
+    if job.status == "running":
+        job.lease_until = now + BROADCAST_LEASE_TTL
+
+        if data.exhausted:
+            left = (
+                await db.execute(
+                    select(
+                        exists().where(
+                            and_(
+                                BroadcastRecipient.job_id == job_id,
+                                BroadcastRecipient.status == "pending",
+                            )
+                        )
+                    )
+                )
+            ).scalar()
+            if not left:
+                job.status = "done"
+                job.finished_at = now
+
+    await db.commit()
+    return _job_json(job)
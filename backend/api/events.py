@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from backend.core.deps import get_worker_id
+from backend.core.events import CLAIMS_CHANNEL, USER_STATE_CHANNEL, event_hub
+
+router = APIRouter(prefix="/events", tags=["events"])
+logger = logging.getLogger(__name__)
+
+# proxy (Railway) idle connection’ni uzmasligi uchun
+PING_EVERY = 15
+
+
+async def _sse_stream(request: Request, channel: str, queue: asyncio.Queue, event: str):
+    try:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                payload = await asyncio.wait_for(queue.get(), PING_EVERY)
+            except asyncio.TimeoutError:
+                # LISTEN connection uzilgan bo‘lsa shu yerda qayta ulanadi
+                await event_hub.ensure_listening(channel)
+                yield ": ping\n\n"
+                continue
+
+            yield f"event: {event}\ndata: {payload}\n\n"
+    finally:
+        event_hub.unsubscribe(channel, queue)
+
+
+@router.get("/claims")
+async def claim_events(request: Request, worker_id: str = Depends(get_worker_id)):
+    """
+    Server-Sent Events stream for workers: one event per user that
+    became claimable. Workers still claim via POST /api/users/claim.
+    """
+    try:
+        queue = await event_hub.subscribe(CLAIMS_CHANNEL)
+    except Exception:
+        logger.exception("CLAIM_EVENTS_SUBSCRIBE_FAILED")
+        raise HTTPException(status_code=503, detail="Event stream unavailable")
+
+    logger.info("CLAIM_EVENTS_SUBSCRIBED worker=%s", worker_id)
+    return StreamingResponse(
+        _sse_stream(request, CLAIMS_CHANNEL, queue, "claimable"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/user-state")
+async def user_state_events(request: Request, worker_id: str = Depends(get_worker_id)):
+    """
+    SSE stream for the bot: {"telegram_ids": [...], "reason": ...} whenever
+    the GET /api/users/{id} view of those users changed, so cached copies
+    can be dropped before their TTL.
+    """
+    try:
+        queue = await event_hub.subscribe(USER_STATE_CHANNEL)
+    except Exception:
+        logger.exception("USER_STATE_EVENTS_SUBSCRIBE_FAILED")
+        raise HTTPException(status_code=503, detail="Event stream unavailable")
+
+    logger.info("USER_STATE_EVENTS_SUBSCRIBED client=%s", worker_id)
+    return StreamingResponse(
+        _sse_stream(request, USER_STATE_CHANNEL, queue, "user_state"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import and_, case, cast, delete, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.db import get_async_db
+from backend.core.deps import get_worker_id
+from backend.models.bot_fsm_state import BotFsmState
+
+router = APIRouter(prefix="/fsm", tags=["fsm"])
+
+# har flush’da shuncha eskirgan qator o‘chiriladi (alohida cron shart emas)
+EXPIRED_SWEEP_LIMIT = 500
+MAX_TTL = 30 * 24 * 3600
+
+
+@router.get("/state")
+async def get_fsm_state(
+    key: str = Query(..., max_length=255),
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """State + data in one read; expired or missing → empty."""
+    row = (
+        await db.execute(
+            select(BotFsmState.state, BotFsmState.data).where(
+                BotFsmState.key == key,
+                BotFsmState.expires_at > datetime.utcnow(),
+            )
+        )
+    ).first()
+
+    if row is None:
+        return {"state": None, "data": {}}
+    return {"state": row.state, "data": row.data or {}}
+
+
+class FsmWrite(BaseModel):
+    key: str
+    set_state: bool = False
+    state: Optional[str] = None
+    set_data: bool = False
+    data: Dict[str, Any] = {}
+
+
+class FsmBatch(BaseModel):
+    ttl: int = 86400
+    items: List[FsmWrite]
+
+
+@router.post("/batch")
+async def write_fsm_states(
+    batch: FsmBatch,
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Bot write-behind flush. Items are grouped by which fields they set,
+    one upsert per group; every write pushes expires_at out by ttl.
+    A key left with no state and no data is deleted.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=max(1, min(batch.ttl, MAX_TTL)))
+
+    # bitta key bir batch’da bir marta (bot allaqachon birlashtiradi, lekin baribir)
+    items: Dict[str, FsmWrite] = {}
+    for item in batch.items:
+        prev = items.get(item.key)
+        if prev is not None:
+            if not item.set_state and prev.set_state:
+                item.set_state, item.state = True, prev.state
+            if not item.set_data and prev.set_data:
+                item.set_data, item.data = True, prev.data
+        items[item.key] = item
+
+    groups: Dict[tuple, List[FsmWrite]] = {}
+    for item in items.values():
+        if item.set_state or item.set_data:
+            groups.setdefault((item.set_state, item.set_data), []).append(item)
+
+    for (set_state, set_data), group in groups.items():
+        stmt = insert(BotFsmState).values([
+            {
+                "key": item.key,
+                "state": item.state if set_state else None,
+                "data": item.data if set_data else {},
+                "expires_at": expires_at,
+                "updated_at": now,
+            }
+            for item in group
+        ])
+        excluded = stmt.excluded
+
+        # eskirgan (hali sweep bo‘lmagan) qator → yozilmagan maydon bo‘sh boshlanadi,
+        # aks holda tashlab ketilgan flow’ning data’si qaytib keladi
+        expired = BotFsmState.expires_at <= now
+        update_cols = {
+            "expires_at": excluded.expires_at,
+            "updated_at": excluded.updated_at,
+            "state": (
+                excluded.state if set_state
+                else case((expired, None), else_=BotFsmState.state)
+            ),
+            "data": (
+                excluded.data if set_data
+                else case((expired, cast({}, JSONB)), else_=BotFsmState.data)
+            ),
+        }
+
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[BotFsmState.key],
+                set_=update_cols,
+            )
+        )
+
+    if items:
+        # clear() → set_state(None) + set_data({}) → qatorni saqlashdan foyda yo‘q
+        await db.execute(
+            delete(BotFsmState).where(
+                and_(
+                    BotFsmState.key.in_(list(items)),
+                    BotFsmState.state.is_(None),
+                    BotFsmState.data == cast({}, JSONB),
+                )
+            )
+        )
+
+    # lazy TTL sweep (ix_bot_fsm_states_expires_at)
+    expired = (
+        select(BotFsmState.key)
+        .where(BotFsmState.expires_at <= now)
+        .limit(EXPIRED_SWEEP_LIMIT)
+        .scalar_subquery()
+    )
+    swept = await db.execute(delete(BotFsmState).where(BotFsmState.key.in_(expired)))
+
+    await db.commit()
+    return {"written": len(items), "expired": swept.rowcount}
@@ -1,11 +1,18 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import BigInteger, DateTime, Integer, cast, column, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.core.db import get_db
+from backend.core.db import get_db, get_async_db
+from backend.core.deps import get_worker_id
 from backend.models.user import User
 from backend.models.trigger import Trigger
+from backend.models.trigger_stat import TriggerStat
 
 from backend.schemas.trigger import (
     TriggerCreate,
@@ -16,6 +23,14 @@ from backend.schemas.trigger import (
 router = APIRouter(prefix="/triggers", tags=["triggers"])
 
 
+def _bump_triggers_version(db: Session, user_id: int) -> None:
+    # 🔁 Worker cache shu versiya o‘zgarganini ko‘rib triggerlarni qayta yuklaydi
+    db.query(User).filter(User.id == user_id).update(
+        {User.triggers_version: User.triggers_version + 1},
+        synchronize_session=False,
+    )
+
+
 @router.post("/", response_model=TriggerRead)
 def create_trigger(payload: TriggerCreate, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.telegram_id == payload.user_telegram_id).first()
@@ -58,28 +73,189 @@ def create_trigger(payload: TriggerCreate, db: Session = Depends(get_db)):
 
     db.add(trigger)
     user.trigger_count += 1
+    _bump_triggers_version(db, user.id)
     db.commit()
     db.refresh(trigger)
     return trigger
 
 
 @router.get("/", response_model=List[TriggerRead])
-def list_triggers(
+async def list_triggers(
     user_telegram_id: int = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = db.query(User).filter(User.telegram_id == user_telegram_id).first()
-    if not user:
+    user_id = (
+        await db.execute(
+            select(User.id).where(User.telegram_id == user_telegram_id)
+        )
+    ).scalar_one_or_none()
+    if user_id is None:
         raise HTTPException(status_code=404, detail="User not found")
 
     triggers = (
-        db.query(Trigger)
-        .filter(Trigger.user_id == user.id)
-        .order_by(Trigger.created_at.asc())
-        .all()
-    )
+        await db.execute(
+            select(Trigger)
+            .where(Trigger.user_id == user_id)
+            .order_by(Trigger.created_at.asc())
+        )
+    ).scalars().all()
     return triggers
 
+@router.get("/versions", response_model=Dict[int, int])
+async def list_trigger_versions(
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Trigger versions of every user owned by the calling worker.
+    Workers poll this once per second instead of fetching triggers per message.
+    """
+    rows = (
+        await db.execute(
+            select(User.telegram_id, User.triggers_version)
+            .where(User.worker_id == worker_id)
+        )
+    ).all()
+    return {telegram_id: version for telegram_id, version in rows}
+
+
+class TriggerStatDelta(BaseModel):
+    trigger_id: int
+    hits: int = 0
+    replies: int = 0
+    last_fired_at: Optional[datetime] = None
+    latency_total_ms: int = 0
+    latency_max_ms: int = 0
+
+
+class TriggerStatsBatch(BaseModel):
+    stats: List[TriggerStatDelta]
+
+
+@router.post("/stats")
+async def flush_trigger_stats(
+    data: TriggerStatsBatch,
+    worker_id: str = Depends(get_worker_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Worker write-behind flush: ONE set-based upsert for all deltas
+    aggregated since the last flush. Deltas of deleted triggers are
+    dropped by the join.
+    """
+    if not data.stats:
+        return {"upserted": 0}
+
+    # ON CONFLICT bitta row’ga ikki marta tega olmaydi → trigger bo‘yicha jamlaymiz
+    merged: Dict[int, TriggerStatDelta] = {}
+    for s in data.stats:
+        m = merged.get(s.trigger_id)
+        if m is None:
+            merged[s.trigger_id] = s.model_copy()
+            continue
+        m.hits += s.hits
+        m.replies += s.replies
+        m.latency_total_ms += s.latency_total_ms
+        m.latency_max_ms = max(m.latency_max_ms, s.latency_max_ms)
+        if s.last_fired_at and (not m.last_fired_at or s.last_fired_at > m.last_fired_at):
+            m.last_fired_at = s.last_fired_at
+
+    deltas = values(
+        column("trigger_id", Integer),
+        column("hits", BigInteger),
+        column("replies", BigInteger),
+        column("last_fired_at", DateTime),
+        column("latency_total_ms", BigInteger),
+        column("latency_max_ms", BigInteger),
+        name="deltas",
+    ).data([
+        (
+            s.trigger_id,
+            s.hits,
+            s.replies,
+            s.last_fired_at,
+            s.latency_total_ms,
+            s.latency_max_ms,
+        )
+        for s in merged.values()
+    ])
+
+    now = datetime.utcnow()
+    stmt = insert(TriggerStat).from_select(
+        [
+            "trigger_id",
+            "user_id",
+            "hit_count",
+            "reply_count",
+            "last_fired_at",
+            "latency_total_ms",
+            "latency_max_ms",
+            "updated_at",
+        ],
+        select(
+            Trigger.id,
+            Trigger.user_id,
+            deltas.c.hits,
+            deltas.c.replies,
+            # hamma qator NULL bo‘lsa VALUES ustuni text bo‘lib qoladi
+            cast(deltas.c.last_fired_at, DateTime),
+            deltas.c.latency_total_ms,
+            deltas.c.latency_max_ms,
+            literal(now, DateTime),
+        ).join(deltas, deltas.c.trigger_id == Trigger.id),
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TriggerStat.trigger_id],
+        set_={
+            "hit_count": TriggerStat.hit_count + excluded.hit_count,
+            "reply_count": TriggerStat.reply_count + excluded.reply_count,
+            "last_fired_at": func.greatest(TriggerStat.last_fired_at, excluded.last_fired_at),
+            "latency_total_ms": TriggerStat.latency_total_ms + excluded.latency_total_ms,
+            "latency_max_ms": func.greatest(TriggerStat.latency_max_ms, excluded.latency_max_ms),
+            "updated_at": excluded.updated_at,
+        },
+    )
+
+    result = await db.execute(stmt)
+    await db.commit()
+    return {"upserted": result.rowcount}
+
+
+@router.get("/stats")
+async def get_trigger_stats(
+    user_telegram_id: int = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = (
+        await db.execute(
+            select(Trigger.id, Trigger.trigger_text, TriggerStat)
+            .join(User, User.id == Trigger.user_id)
+            .outerjoin(TriggerStat, TriggerStat.trigger_id == Trigger.id)
+            .where(User.telegram_id == user_telegram_id)
+            .order_by(Trigger.id)
+        )
+    ).all()
+
+    return [
+        {
+            "trigger_id": trigger_id,
+            "trigger_text": trigger_text,
+            "hits": stat.hit_count if stat else 0,
+            "replies": stat.reply_count if stat else 0,
+            "last_fired_at": (
+                stat.last_fired_at.isoformat() if stat and stat.last_fired_at else None
+            ),
+            "avg_latency_ms": (
+                stat.latency_total_ms // stat.reply_count
+                if stat and stat.reply_count else None
+            ),
+            "max_latency_ms": stat.latency_max_ms if stat else None,
+        }
+        for trigger_id, trigger_text, stat in rows
+    ]
+
+
 @router.get("/limit")
 def get_trigger_limit_info(
     user_telegram_id: int = Query(...),
@@ -128,6 +304,7 @@ def delete_trigger(trigger_id: int, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == trigger.user_id).first()
     if user and user.trigger_count > 0:
         user.trigger_count -= 1
+    _bump_triggers_version(db, trigger.user_id)
     db.commit()
     return {"detail": "Deleted"}
 
@@ -149,6 +326,7 @@ def update_trigger(
     if payload.is_active is not None:
         trigger.is_active = payload.is_active
 
+    _bump_triggers_version(db, trigger.user_id)
     db.commit()
     db.refresh(trigger)
     return trigger
\ No newline at end of file
@@ -1,12 +1,16 @@
 from datetime import datetime, timedelta
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, case, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
-from backend.core.db import get_db
+from backend.core.db import get_db, get_async_db
+from backend.core.events import CLAIMS_CHANNEL, notify, notify_user_state
 from backend.models.telegram_session import TelegramSession
 from backend.models.user import PlanEnum, User
 from backend.models.admin import Admin
@@ -16,14 +20,77 @@ router = APIRouter(prefix="/users", tags=["users"])
 logger = logging.getLogger(__name__)
 
 
+def _status_etag(status: dict) -> str:
+    # bool’lar → bit qatori: kichik, deterministik, DB’da versiya ustuni shart emas
+    bits = "".join(
+        "1" if status[k] else "0"
+        for k in ("is_registered", "worker_active", "has_session", "is_admin", "has_phone")
+    )
+    return f'W/"{bits}"'
+
+
+@router.get("/{telegram_id}/status")
+async def get_user_status(
+    telegram_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Slim projection for the bot's per-update check: booleans only, one
+    statement (users.telegram_id unique index + two EXISTS probes on
+    indexed columns), no session_string on the wire.
+
+    ETag is derived from the booleans; If-None-Match → 304.
+    """
+    row = (
+        await db.execute(
+            select(
+                User.is_registered,
+                User.worker_active,
+                User.phone,
+                exists().where(
+                    TelegramSession.user_id == User.id,
+                    TelegramSession.session_string.isnot(None),
+                ).label("has_session"),
+                exists().where(
+                    Admin.telegram_id == User.telegram_id,
+                    Admin.is_active.is_(True),
+                ).label("is_admin"),
+            ).where(User.telegram_id == telegram_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # GET /{telegram_id} bilan bir xil "effective" qoida: session yo‘q → uzilgan
+    status = {
+        "telegram_id": telegram_id,
+        "is_registered": bool(row.is_registered and row.has_session),
+        "worker_active": bool(row.worker_active and row.has_session),
+        "has_session": bool(row.has_session),
+        "is_admin": bool(row.is_admin),
+        "has_phone": bool(row.phone and row.phone != "not provided"),
+    }
+
+    etag = _status_etag(status)
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    status["version"] = etag
+    return status
+
+
 @router.get("/{telegram_id}")
-def get_user(telegram_id: int, db: Session = Depends(get_db)):
+async def get_user(telegram_id: int, db: AsyncSession = Depends(get_async_db)):
     user = (
-        db.query(User)
-        .options(joinedload(User.telegram_session))
-        .filter(User.telegram_id == telegram_id)
-        .first()
-    )
+        await db.execute(
+            select(User)
+            .options(joinedload(User.telegram_session))
+            .where(User.telegram_id == telegram_id)
+        )
+    ).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -39,14 +106,15 @@ def get_user(telegram_id: int, db: Session = Depends(get_db)):
     effective_worker_active = bool(user.worker_active and session_string)
 
     is_admin = (
-        db.query(Admin)
-        .filter(
-            Admin.telegram_id == user.telegram_id,
-            Admin.is_active.is_(True),
+        await db.execute(
+            select(Admin.id)
+            .where(
+                Admin.telegram_id == user.telegram_id,
+                Admin.is_active.is_(True),
+            )
+            .limit(1)
         )
-        .first()
-        is not None
-    )
+    ).first() is not None
 
     # ✅ BOT VA MIDDLEWARE SHU JSON’GA ISHONADI
     return {
@@ -77,39 +145,70 @@ def get_worker_id(
     return x_worker_id
 
 
+CLAIM_STALE_AFTER = timedelta(seconds=45)
+
+# must match worker SHARD_BUCKETS (telegram_id % N → shard bucket)
+DEFAULT_SHARD_BUCKETS = 256
+
+
+def claimable_users_query(
+    now: datetime,
+    limit: int,
+    buckets: Optional[list[int]] = None,
+    bucket_count: int = DEFAULT_SHARD_BUCKETS,
+):
+    """
+    Claim query. The WHERE clause must keep implying the predicate of
+    the ix_users_claimable partial index, otherwise Postgres falls back
+    to a seq scan + sort (see backend/benchmarks/claim_plan.py).
+
+    buckets: sharded workers only claim telegram_id % bucket_count
+    in their own buckets (plain filter on top of the index scan).
+    """
+    query = (
+        select(User, TelegramSession.session_string)
+        .join(TelegramSession, TelegramSession.user_id == User.id)
+        .where(
+            User.is_registered.is_(True),
+            TelegramSession.session_string.isnot(None),
+            or_(
+                User.worker_id.is_(None),
+                and_(
+                    User.last_seen_at.isnot(None),
+                    User.last_seen_at < now - CLAIM_STALE_AFTER,
+                ),
+            ),
+            or_(
+                User.worker_active.is_(False),
+                User.worker_id.is_(None),
+            ),
+        )
+        .order_by(User.last_seen_at.asc().nullslast())
+        .limit(limit)
+        .with_for_update(of=User, skip_locked=True)
+    )
+    if buckets is not None:
+        query = query.where((User.telegram_id % bucket_count).in_(buckets))
+    return query
+
+
 @router.post("/claim")
-def claim_users(
+async def claim_users(
     limit: int = 50,
+    buckets: Optional[list[int]] = Query(None),
+    bucket_count: int = DEFAULT_SHARD_BUCKETS,
     worker_id: str = Depends(get_worker_id),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    STALE_AFTER = timedelta(seconds=45)
     now = datetime.utcnow()
 
+    if bucket_count <= 0:
+        raise HTTPException(status_code=400, detail="bucket_count must be positive")
+
     try:
         rows = (
-            db.query(User, TelegramSession.session_string)
-            .join(TelegramSession, TelegramSession.user_id == User.id)
-            .filter(
-                User.is_registered.is_(True),
-                TelegramSession.session_string.isnot(None),
-                or_(
-                    User.worker_id.is_(None),
-                    and_(
-                        User.last_seen_at.isnot(None),
-                        User.last_seen_at < now - STALE_AFTER,
-                    ),
-                ),
-                or_(
-                    User.worker_active.is_(False),
-                    User.worker_id.is_(None),
-                ),
-            )
-            .order_by(User.last_seen_at.asc().nullslast())
-            .limit(limit)
-            .with_for_update(of=User, skip_locked=True)
-            .all()
-        )
+            await db.execute(claimable_users_query(now, limit, buckets, bucket_count))
+        ).all()
 
         if not rows:
             return []
@@ -117,20 +216,24 @@ def claim_users(
         for u, _session in rows:
             u.worker_id = worker_id
             u.worker_active = True
+            # 🔒 yangi lease: eski owner’ning heartbeat’i endi o‘tmaydi
+            u.lease_epoch = (u.lease_epoch or 0) + 1
 
-        db.commit()
+        await db.commit()
 
         return [
             {
                 "telegram_id": u.telegram_id,
                 "session_string": session_string,
+                "last_processed_msg_id": u.last_processed_msg_id,
+                "lease_epoch": u.lease_epoch,
             }
             for (u, session_string) in rows
         ]
 
     except Exception:
         # 🔥 MANA SHU YERGA
-        db.rollback()
+        await db.rollback()
         logger.exception("CLAIM_USERS_FATAL")
         return []
 
@@ -250,6 +353,10 @@ def complete_registration(
     user.worker_active = False
     user.last_seen_at = datetime.utcnow()
 
+    # 📣 workerlar darhol claim qilsin (polling kutmasdan)
+    notify(db, CLAIMS_CHANNEL, telegram_id=user.telegram_id, reason="registered")
+    notify_user_state(db, [user.telegram_id], reason="registered")
+
     db.commit()
     db.refresh(user)
     return {"status": "ok"}
@@ -258,8 +365,13 @@ def complete_registration(
 # =========================
 # Heartbeat
 # =========================
+class HeartbeatRequest(BaseModel):
+    worker_id: str
+    lease_epoch: int
+
+
 @router.post("/heartbeat/{telegram_id}")
-def heartbeat(telegram_id: int, db: Session = Depends(get_db)):
+def heartbeat(telegram_id: int, data: HeartbeatRequest, db: Session = Depends(get_db)):
     user = (
         db.query(User)
         .options(joinedload(User.telegram_session))
@@ -269,10 +381,15 @@ def heartbeat(telegram_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    # 🔒 fencing: batch heartbeat bilan bir xil — faqat joriy lease egasi
+    if user.worker_id != data.worker_id or user.lease_epoch != data.lease_epoch:
+        raise HTTPException(status_code=409, detail="Lease lost")
+
     # 🔒 HARD GUARD: no session = no heartbeat
     if not user.telegram_session or not user.telegram_session.session_string:
         user.worker_active = False
         user.worker_id = None
+        notify_user_state(db, [telegram_id], reason="stale_worker")
         db.commit()
         raise HTTPException(status_code=403, detail="Session not active")
 
@@ -283,6 +400,112 @@ def heartbeat(telegram_id: int, db: Session = Depends(get_db)):
     return {"status": "ok"}
 
 
+def _advance_cursors(cursors: dict[int, int]):
+    """last_processed_msg_id = GREATEST(current, reported) — never moves back."""
+    return func.greatest(
+        User.last_processed_msg_id,
+        case(cursors, value=User.telegram_id, else_=User.last_processed_msg_id),
+    )
+
+
+class HeartbeatBatchRequest(BaseModel):
+    worker_id: str
+    # telegram_id -> lease_epoch received from claim (fencing token)
+    leases: dict[int, int]
+    # telegram_id -> last processed incoming message id (catch-up cursor)
+    cursors: dict[int, int] = {}
+
+
+@router.post("/heartbeat")
+async def heartbeat_batch(
+    data: HeartbeatBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    One heartbeat per worker per interval: a single set-based UPDATE
+    for every account the worker is running.
+
+    Fenced: a row only matches when worker_id AND lease_epoch are still
+    the ones the worker claimed with. Rejected ids = lease lost → the
+    worker must drop those clients.
+    """
+    if not data.leases:
+        return {"alive": [], "rejected": []}
+
+    telegram_ids = list(data.leases)
+
+    has_session = exists().where(TelegramSession.user_id == User.id)
+
+    values = {"worker_active": True, "last_seen_at": datetime.utcnow()}
+    if data.cursors:
+        values["last_processed_msg_id"] = _advance_cursors(data.cursors)
+
+    # 🔒 faqat shu worker’ga tegishli va session’i bor userlar
+    alive = (await db.execute(
+        update(User)
+        .where(
+            User.telegram_id.in_(telegram_ids),
+            User.worker_id == data.worker_id,
+            User.lease_epoch == case(data.leases, value=User.telegram_id),
+            has_session,
+        )
+        .values(**values)
+        .returning(User.telegram_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+
+    alive_set = set(alive)
+    rejected = [tid for tid in telegram_ids if tid not in alive_set]
+    if rejected:
+        logger.warning(
+            "HEARTBEAT_REJECTED worker=%s ids=%s", data.worker_id, rejected
+        )
+
+    return {"alive": alive, "rejected": rejected}
+
+
+class ReleaseRequest(BaseModel):
+    worker_id: str
+    # None → every account owned by worker_id (worker died / shut down)
+    telegram_ids: Optional[list[int]] = None
+    # final catch-up cursors, so the next owner does not re-process them
+    cursors: dict[int, int] = {}
+
+
+@router.post("/release")
+def release_users(data: ReleaseRequest, db: Session = Depends(get_db)):
+    """
+    Bulk hand-back: accounts become claimable right away (one UPDATE,
+    one NOTIFY) instead of waiting CLAIM_STALE_AFTER for a stale heartbeat.
+    Only accounts still owned by worker_id are touched.
+    """
+    stmt = update(User).where(User.worker_id == data.worker_id)
+    if data.telegram_ids is not None:
+        if not data.telegram_ids:
+            return {"released": []}
+        stmt = stmt.where(User.telegram_id.in_(data.telegram_ids))
+
+    values = {"worker_active": False, "worker_id": None, "last_seen_at": None}
+    if data.cursors:
+        values["last_processed_msg_id"] = _advance_cursors(data.cursors)
+
+    released = db.execute(
+        stmt
+        .values(**values)
+        .returning(User.telegram_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    if released:
+        notify(db, CLAIMS_CHANNEL, count=len(released), reason="released")
+        notify_user_state(db, released, reason="released")
+    db.commit()
+
+    logger.info("USERS_RELEASED worker=%s count=%s", data.worker_id, len(released))
+    return {"released": released}
+
+
 # =========================
 # Update phone
 # =========================
@@ -299,6 +522,7 @@ def update_phone(
     user.phone = data.phone
     # Phone update does NOT mean full registration
     # user.is_registered and user.registered_at are NOT set here
+    notify_user_state(db, [user.telegram_id], reason="phone")
 
     db.commit()
     db.refresh(user)
@@ -317,6 +541,8 @@ def worker_disconnected(telegram_id: int, db: Session = Depends(get_db)):
     user.worker_active = False
     user.worker_id = None
     user.last_seen_at = None
+    notify(db, CLAIMS_CHANNEL, telegram_id=user.telegram_id, reason="released")
+    notify_user_state(db, [user.telegram_id], reason="worker_disconnected")
     db.commit()
 
     return {"status": "disconnected"}
@@ -343,6 +569,10 @@ def session_revoked(telegram_id: int, db: Session = Depends(get_db)):
     # ❗ MUHIM: is_registered NI O‘CHIRMAYMIZ
     # user.is_registered = False  ❌ YO‘Q
 
+    # worker’da slot bo‘shadi → navbatdagi userlarni claim qilsin
+    notify(db, CLAIMS_CHANNEL, telegram_id=user.telegram_id, reason="session_revoked")
+    notify_user_state(db, [user.telegram_id], reason="session_revoked")
+
     db.commit()
     return {"status": "revoked"}
 
@@ -351,22 +581,27 @@ def reset_stale_workers(db: Session = Depends(get_db)):
     now = datetime.utcnow()
     STALE_AFTER = timedelta(seconds=60)
 
-    users = (
-        db.query(User)
-        .filter(
-            User.worker_active.is_(True),
+    # Set-based: `worker_active == True` → partial index (WHERE worker_active)
+    released = db.execute(
+        update(User)
+        .where(
+            User.worker_active == True,
             User.last_seen_at.isnot(None),
             User.last_seen_at < now - STALE_AFTER,
         )
-        .all()
-    )
-
-    for u in users:
-        u.worker_active = False
-        u.worker_id = None
-
+        .values(worker_active=False, worker_id=None)
+        .returning(User.telegram_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if released:
+        notify_user_state(db, released, reason="stale_worker")
     db.commit()
-    return {"reset": len(users)}
+
+    if released:
+        logger.info(
+            "RESET_STALE_WORKERS count=%s ids=%s", len(released), released[:50]
+        )
+    return {"reset": len(released)}
 
 
 @router.get("/{telegram_id}/connection-status")
@@ -0,0 +1,110 @@
+# backend/benchmarks/hot_endpoints.py
+"""
+Requests/s benchmark for the hot backend endpoints.
+
+Run it against the old and the new deployment and compare:
+
+    python -m backend.benchmarks.hot_endpoints \\
+        --url http://old-backend:8000 --url http://new-backend:8000 \\
+        --telegram-id 123456789 --concurrency 50 --duration 20
+
+Safe for production data: claim is called with limit=0 and the heartbeat
+uses a worker id that owns no accounts, so nothing is modified.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+BENCH_WORKER_ID = "benchmark-no-accounts"
+
+
+def _endpoints(telegram_id: int) -> dict:
+    return {
+        "get_user": ("GET", f"/api/users/{telegram_id}", {}),
+        "triggers_list": (
+            "GET",
+            "/api/triggers/",
+            {"params": {"user_telegram_id": telegram_id}},
+        ),
+        "claim": (
+            "POST",
+            "/api/users/claim",
+            {"params": {"limit": 0}, "headers": {"X-Worker-ID": BENCH_WORKER_ID}},
+        ),
+        "heartbeat": (
+            "POST",
+            "/api/users/heartbeat",
+            {"json": {"worker_id": BENCH_WORKER_ID, "leases": {str(telegram_id): 0}}},
+        ),
+    }
+
+
+async def _run_endpoint(
+    client: httpx.AsyncClient,
+    method: str,
+    path: str,
+    kwargs: dict,
+    concurrency: int,
+    duration: float,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def _worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                res = await client.request(method, path, **kwargs)
+                if res.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+async def main(args) -> None:
+    results: dict[str, dict[str, dict]] = {}
+
+    for url in args.url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as client:
+            for name, (method, path, kwargs) in _endpoints(args.telegram_id).items():
+                print(f"⏱  {url} {name} ...")
+                results.setdefault(name, {})[url] = await _run_endpoint(
+                    client, method, path, kwargs, args.concurrency, args.duration
+                )
+
+    print()
+    print(f"{'endpoint':<15} {'url':<40} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+    for name, per_url in results.items():
+        for url, r in per_url.items():
+            print(
+                f"{name:<15} {url:<40} {r['rps']:>10.1f} "
+                f"{r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", action="append", required=True)
+    parser.add_argument("--telegram-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -11,6 +11,13 @@ class Settings(BaseSettings):
     TELEGRAM_API_HASH: Optional[str] = None
     BOT_TOKEN: Optional[str] = None
 
+    # === DB POOL (sync psycopg2 + async asyncpg engine’lar) ===
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+
     # === BACKEND URL (worker / bot uchun, backend o‘zi ishlatmaydi) ===
     BACKEND_URL: Optional[str] = None
 
@@ -1,14 +1,16 @@
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy import text
+from sqlalchemy import text, update
 
 from backend.core.db import SessionLocal
+from backend.core.events import notify_user_state
 from backend.models.user import User, PlanEnum
 
 CHECK_EVERY = 60
 TIMEOUT = 90
 PLAN_CHECK_EVERY = 300
 ANALYTICS_REFRESH_EVERY = 300
+LOG_IDS_LIMIT = 50
 
 
 # 🔒 BU YERDA GLOBAL FLAG
@@ -21,20 +23,29 @@ async def worker_watchdog():
         try:
             cutoff = datetime.utcnow() - timedelta(seconds=TIMEOUT)
 
-            users = db.query(User).filter(
-                User.worker_active == True,
-                User.last_seen_at.isnot(None),
-                User.last_seen_at < cutoff
-            ).all()
-
-            if users:
-                for u in users:
-                    u.worker_active = False
-                    u.worker_id = None
-                    u.last_seen_at = None
+            # 🔥 bitta UPDATE ... RETURNING (ORM obyektlar xotiraga yuklanmaydi)
+            # `worker_active == True` → partial index (WHERE worker_active) ishlaydi
+            released = db.execute(
+                update(User)
+                .where(
+                    User.worker_active == True,
+                    User.last_seen_at.isnot(None),
+                    User.last_seen_at < cutoff,
+                )
+                .values(worker_active=False, worker_id=None, last_seen_at=None)
+                .returning(User.telegram_id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            if released:
+                # 📣 bot cache’i bu userlarni "ulangan" deb saqlab turmasin
+                notify_user_state(db, released, reason="stale_worker")
+            db.commit()
 
-                db.commit()
-                print(f"🧹 watchdog released {len(users)} stale users")
+            if released:
+                print(
+                    f"🧹 watchdog released {len(released)} stale users: "
+                    f"{released[:LOG_IDS_LIMIT]}"
+                )
 
         except Exception as e:
             db.rollback()
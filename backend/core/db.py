@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 from .config import settings
@@ -19,13 +21,40 @@ engine = create_engine(
     future=True,  # SQLAlchemy 2.0 style
 
     # 🔥 MUHIM: Railway Postgres + SSL barqarorligi uchun
-    pool_size=5,          # nechta doimiy connection
-    max_overflow=10,       # vaqtinchalik qo‘shimcha connection
+    pool_size=settings.DB_POOL_SIZE,          # nechta doimiy connection
+    max_overflow=settings.DB_MAX_OVERFLOW,    # vaqtinchalik qo‘shimcha connection
+    pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_pre_ping=True,   # o‘lik connection’ni avtomatik tekshiradi
     pool_recycle=300,     # 5 daqiqada connection’ni yangilaydi
 )
 
 
+# =========================
+# Async engine (hot endpoints: claim, heartbeat, triggers, get_user)
+# =========================
+def _async_database_url(url: str):
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+
+    # asyncpg libpq’ning sslmode parametrini tushunmaydi → ssl
+    sslmode = async_url.query.get("sslmode")
+    if sslmode:
+        async_url = async_url.difference_update_query(["sslmode"])
+        async_url = async_url.update_query_dict({"ssl": sslmode})
+
+    return async_url
+
+
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    echo=False,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=300,
+)
+
+
 # =========================
 # Session
 # =========================
@@ -45,4 +74,20 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# =========================
+# Async session + dependency
+# =========================
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
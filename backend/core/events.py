@@ -0,0 +1,110 @@
+# backend/core/events.py
+"""
+Postgres LISTEN/NOTIFY plumbing.
+
+- notify(): queue a NOTIFY inside the caller's transaction (sent on COMMIT)
+- event_hub: one dedicated asyncpg LISTEN connection per backend process,
+  fanned out to in-process subscribers (SSE streams in backend/api/events.py)
+"""
+from __future__ import annotations
+from typing import Dict, Optional, Set
+import asyncio
+import json
+import logging
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# user became claimable (registration / login / worker released it)
+CLAIMS_CHANNEL = "ghostreply_claims"
+
+# user’s GET /api/users/{id} view changed → bot drops its cached copy
+USER_STATE_CHANNEL = "ghostreply_user_state"
+
+SUBSCRIBER_QUEUE_MAX = 100
+
+# pg_notify payload 8000 baytdan oshmasin
+NOTIFY_IDS_PER_PAYLOAD = 300
+
+
+def notify(db: Session, channel: str, **payload) -> None:
+    """
+    NOTIFY is transactional: listeners only see it after db.commit(),
+    so workers never race ahead of the data they are told about.
+    """
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": json.dumps(payload)},
+    )
+
+
+def notify_user_state(db: Session, telegram_ids, reason: str) -> None:
+    ids = list(telegram_ids)
+    for i in range(0, len(ids), NOTIFY_IDS_PER_PAYLOAD):
+        notify(
+            db,
+            USER_STATE_CHANNEL,
+            telegram_ids=ids[i:i + NOTIFY_IDS_PER_PAYLOAD],
+            reason=reason,
+        )
+
+
+class EventHub:
+    def __init__(self, dsn: str) -> None:
+        self._dsn = dsn
+        self._conn: Optional[asyncpg.Connection] = None
+        self._listening: Set[str] = set()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def ensure_listening(self, channel: str) -> None:
+        """(Re)connect lazily — lifespan must stay free of background jobs."""
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                self._conn = await asyncpg.connect(self._dsn)
+                self._conn.add_termination_listener(self._on_terminated)
+                self._listening = set()
+                logger.info("EVENT_HUB_CONNECTED")
+
+            if channel not in self._listening:
+                await self._conn.add_listener(channel, self._on_notify)
+                self._listening.add(channel)
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_MAX)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            await self.ensure_listening(channel)
+        except Exception:
+            self.unsubscribe(channel, queue)
+            raise
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        self._subscribers.get(channel, set()).discard(queue)
+
+    def _on_notify(self, _conn, _pid, channel: str, payload: str) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # sekin subscriber: event faqat "uyg‘otish" signali, tashlab ketsa bo‘ladi
+                logger.warning("EVENT_HUB_SUBSCRIBER_FULL channel=%s", channel)
+
+    def _on_terminated(self, _conn) -> None:
+        logger.warning("EVENT_HUB_CONNECTION_LOST")
+        self._conn = None
+
+
+# asyncpg faqat oddiy postgresql:// DSN’ni tushunadi (driver suffix’siz)
+event_hub = EventHub(
+    make_url(settings.DATABASE_URL)
+    .set(drivername="postgresql")
+    .render_as_string(hide_password=False)
+)
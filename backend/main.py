@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
 
-from backend.api import users, triggers, payment, admin, analytics
+from backend.api import users, triggers, payment, admin, analytics, events, broadcasts, fsm
 from Frontend.web_login import router as web_login_router
 
 
@@ -33,6 +33,9 @@ app.include_router(triggers.router, prefix="/api")
 app.include_router(payment.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+app.include_router(broadcasts.router, prefix="/api")
+app.include_router(fsm.router, prefix="/api")
 
 # Web-login router (HTML)
 app.include_router(web_login_router)  # /web-login/...
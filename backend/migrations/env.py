@@ -10,7 +10,10 @@ load_dotenv()
 from backend.core.db import Base
 from backend.models.user import User
 from backend.models.trigger import Trigger
+from backend.models.trigger_stat import TriggerStat
 from backend.models.payment import Payment
+from backend.models.broadcast import BroadcastJob, BroadcastRecipient
+from backend.models.bot_fsm_state import BotFsmState
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
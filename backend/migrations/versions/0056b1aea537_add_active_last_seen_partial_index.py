@@ -0,0 +1,40 @@
+"""add partial index for stale worker reclamation
+
+Revision ID: 0056b1aea537
+Revises: b08eb118f5eb
+Create Date: 2026-10-17 11:02:47.918233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0056b1aea537'
+down_revision: Union[str, Sequence[str], None] = 'b08eb118f5eb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # watchdog / reset-stale-workers: WHERE worker_active AND last_seen_at < cutoff
+    # CONCURRENTLY → users jadvali lock bo‘lmaydi
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_active_last_seen_at",
+            "users",
+            ["last_seen_at"],
+            postgresql_where=sa.text("worker_active"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_active_last_seen_at",
+            table_name="users",
+            postgresql_concurrently=True,
+        )
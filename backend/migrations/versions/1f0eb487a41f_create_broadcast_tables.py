@@ -0,0 +1,66 @@
+"""create broadcast_jobs and broadcast_recipients tables
+
+Revision ID: 1f0eb487a41f
+Revises: f978ad82dfab
+Create Date: 2026-10-17 18:41:07.312906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f0eb487a41f'
+down_revision: Union[str, Sequence[str], None] = 'f978ad82dfab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "broadcast_jobs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("created_by", sa.BigInteger, nullable=False),
+        sa.Column("text", sa.Text, nullable=False),
+        sa.Column("status", sa.String(16), server_default="pending", nullable=False),
+        sa.Column("total", sa.Integer, server_default="0", nullable=False),
+        sa.Column("sent_count", sa.Integer, server_default="0", nullable=False),
+        sa.Column("failed_count", sa.Integer, server_default="0", nullable=False),
+        sa.Column("blocked_count", sa.Integer, server_default="0", nullable=False),
+        sa.Column("progress_chat_id", sa.BigInteger, nullable=True),
+        sa.Column("progress_message_id", sa.Integer, nullable=True),
+        sa.Column("runner_id", sa.String(64), nullable=True),
+        sa.Column("lease_until", sa.DateTime, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+        sa.Column("started_at", sa.DateTime, nullable=True),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    )
+
+    op.create_table(
+        "broadcast_recipients",
+        sa.Column(
+            "job_id",
+            sa.Integer,
+            sa.ForeignKey("broadcast_jobs.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("telegram_id", sa.BigInteger, primary_key=True),
+        sa.Column("status", sa.String(16), server_default="pending", nullable=False),
+        sa.Column("attempts", sa.SmallInteger, server_default="0", nullable=False),
+        sa.Column("error", sa.String(255), nullable=True),
+        sa.Column("sent_at", sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        "ix_broadcast_recipients_pending",
+        "broadcast_recipients",
+        ["job_id", "telegram_id"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_broadcast_recipients_pending", table_name="broadcast_recipients")
+    op.drop_table("broadcast_recipients")
+    op.drop_table("broadcast_jobs")
@@ -0,0 +1,35 @@
+"""add lease_epoch to users
+
+Revision ID: 6efba666bc1a
+Revises: b07f23acce02
+Create Date: 2026-10-17 15:21:07.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6efba666bc1a'
+down_revision: Union[str, Sequence[str], None] = 'b07f23acce02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Fencing token: har claim’da +1, heartbeat faqat joriy epoch bilan o‘tadi
+    op.add_column(
+        "users",
+        sa.Column(
+            "lease_epoch",
+            sa.BigInteger,
+            server_default="0",
+            nullable=False,
+        )
+    )
+
+
+def downgrade():
+    op.drop_column("users", "lease_epoch")
@@ -0,0 +1,46 @@
+"""add partial index for the claim query
+
+Revision ID: 7f5d18b94d64
+Revises: 0056b1aea537
+Create Date: 2026-10-17 11:40:05.331907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f5d18b94d64'
+down_revision: Union[str, Sequence[str], None] = '0056b1aea537'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# ⚠️ claimable_users_query() (backend/api/users.py) bilan bir xil bo‘lishi SHART
+CLAIMABLE_PREDICATE = (
+    "is_registered IS TRUE AND (worker_active IS FALSE OR worker_id IS NULL)"
+)
+
+
+def upgrade():
+    # Claim: ORDER BY last_seen_at NULLS LAST LIMIT n → index order = sort order,
+    # faqat claim qilinishi mumkin bo‘lgan userlar indexda
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_claimable",
+            "users",
+            ["last_seen_at"],
+            postgresql_where=sa.text(CLAIMABLE_PREDICATE),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_claimable",
+            table_name="users",
+            postgresql_concurrently=True,
+        )
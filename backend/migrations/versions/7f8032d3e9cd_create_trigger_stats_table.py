@@ -0,0 +1,48 @@
+"""create trigger_stats table
+
+Revision ID: 7f8032d3e9cd
+Revises: 6efba666bc1a
+Create Date: 2026-10-17 16:02:44.905117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f8032d3e9cd'
+down_revision: Union[str, Sequence[str], None] = '6efba666bc1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "trigger_stats",
+        sa.Column(
+            "trigger_id",
+            sa.Integer,
+            sa.ForeignKey("triggers.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "user_id",
+            sa.Integer,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("hit_count", sa.BigInteger, server_default="0", nullable=False),
+        sa.Column("reply_count", sa.BigInteger, server_default="0", nullable=False),
+        sa.Column("last_fired_at", sa.DateTime, nullable=True),
+        sa.Column("latency_total_ms", sa.BigInteger, server_default="0", nullable=False),
+        sa.Column("latency_max_ms", sa.BigInteger, server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_trigger_stats_user_id", "trigger_stats", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_trigger_stats_user_id", table_name="trigger_stats")
+    op.drop_table("trigger_stats")
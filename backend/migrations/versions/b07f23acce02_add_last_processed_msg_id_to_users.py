@@ -0,0 +1,30 @@
+"""add last_processed_msg_id to users
+
+Revision ID: b07f23acce02
+Revises: 7f5d18b94d64
+Create Date: 2026-10-17 14:03:52.118407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b07f23acce02'
+down_revision: Union[str, Sequence[str], None] = '7f5d18b94d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Worker catch-up cursor: oxirgi ko‘rilgan incoming message id
+    op.add_column(
+        "users",
+        sa.Column("last_processed_msg_id", sa.BigInteger, nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("users", "last_processed_msg_id")
@@ -0,0 +1,35 @@
+"""add triggers_version to users
+
+Revision ID: b08eb118f5eb
+Revises: 5e7ead044c70
+Create Date: 2026-10-17 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b08eb118f5eb'
+down_revision: Union[str, Sequence[str], None] = '5e7ead044c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Worker trigger cache shu versiya orqali eskirganini biladi
+    op.add_column(
+        "users",
+        sa.Column(
+            "triggers_version",
+            sa.Integer,
+            server_default="0",
+            nullable=False,
+        )
+    )
+
+
+def downgrade():
+    op.drop_column("users", "triggers_version")
@@ -0,0 +1,41 @@
+"""create bot_fsm_states table
+
+Revision ID: b9217a9e18c4
+Revises: 1f0eb487a41f
+Create Date: 2026-10-17 21:12:36.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9217a9e18c4'
+down_revision: Union[str, Sequence[str], None] = '1f0eb487a41f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "bot_fsm_states",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("state", sa.String(255), nullable=True),
+        sa.Column(
+            "data",
+            postgresql.JSONB,
+            server_default=sa.text("'{}'::jsonb"),
+            nullable=False,
+        ),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_bot_fsm_states_expires_at", "bot_fsm_states", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_bot_fsm_states_expires_at", table_name="bot_fsm_states")
+    op.drop_table("bot_fsm_states")
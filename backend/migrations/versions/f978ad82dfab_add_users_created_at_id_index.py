@@ -0,0 +1,38 @@
+"""add users (created_at, id) index for keyset pagination
+
+Revision ID: f978ad82dfab
+Revises: 7f8032d3e9cd
+Create Date: 2026-10-17 16:48:13.271935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f978ad82dfab'
+down_revision: Union[str, Sequence[str], None] = '7f8032d3e9cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Admin users list: ORDER BY created_at DESC, id DESC + keyset (created_at, id) < cursor
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_created_at_id",
+            "users",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_created_at_id",
+            table_name="users",
+            postgresql_concurrently=True,
+        )
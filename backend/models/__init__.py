@@ -1,5 +1,8 @@
 from .user import User
 from .telegram_session import TelegramSession
 from .trigger import Trigger
+from .trigger_stat import TriggerStat
 from .admin import Admin
-from .payment import Payment
\ No newline at end of file
+from .payment import Payment
+from .broadcast import BroadcastJob, BroadcastRecipient
+from .bot_fsm_state import BotFsmState
\ No newline at end of file
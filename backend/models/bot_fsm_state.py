@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from backend.core.db import Base
+
+
+class BotFsmState(Base):
+    """
+    aiogram FSM state + data of one (bot, chat, user) key, shared by all
+    bot replicas. Written only through the bot storage's batched flush
+    (POST /api/fsm/batch); rows past expires_at are treated as absent and
+    swept lazily.
+    """
+    __tablename__ = "bot_fsm_states"
+
+    # "<bot_id>:<chat_id>:<user_id>[:<thread_id>]:<destiny>"
+    key = Column(String(255), primary_key=True)
+
+    state = Column(String(255), nullable=True)
+    data = Column(JSONB, default=dict, server_default=text("'{}'::jsonb"), nullable=False)
+
+    expires_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    Text,
+    text,
+)
+
+from backend.core.db import Base
+
+
+class BroadcastJob(Base):
+    """
+    Admin announcement. Recipients are snapshotted into
+    broadcast_recipients when the job is created; the bot's broadcast
+    runner leases the job (runner_id + lease_until), so a restarted or
+    second bot process resumes it instead of starting over.
+    """
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True)
+
+    created_by = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+
+    # pending → running → done | cancelled
+    status = Column(String(16), default="pending", server_default="pending", nullable=False)
+
+    total = Column(Integer, default=0, server_default="0", nullable=False)
+    sent_count = Column(Integer, default=0, server_default="0", nullable=False)
+    failed_count = Column(Integer, default=0, server_default="0", nullable=False)
+    blocked_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # admin chatidagi "progress" xabari — runner uni tahrirlab boradi
+    progress_chat_id = Column(BigInteger, nullable=True)
+    progress_message_id = Column(Integer, nullable=True)
+
+    runner_id = Column(String(64), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class BroadcastRecipient(Base):
+    __tablename__ = "broadcast_recipients"
+    __table_args__ = (
+        # runner faqat pending’larni o‘qiydi
+        Index(
+            "ix_broadcast_recipients_pending",
+            "job_id",
+            "telegram_id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    job_id = Column(
+        Integer,
+        ForeignKey("broadcast_jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    telegram_id = Column(BigInteger, primary_key=True)
+
+    # pending | sent | failed | blocked
+    status = Column(String(16), default="pending", server_default="pending", nullable=False)
+    attempts = Column(SmallInteger, default=0, server_default="0", nullable=False)
+    error = Column(String(255), nullable=True)
+    sent_at = Column(DateTime, nullable=True)
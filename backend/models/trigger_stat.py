@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer
+
+from backend.core.db import Base
+
+
+class TriggerStat(Base):
+    """
+    Per-trigger counters, written only by the worker's periodic bulk
+    flush (POST /api/triggers/stats) — never per message.
+    """
+    __tablename__ = "trigger_stats"
+
+    trigger_id = Column(
+        Integer,
+        ForeignKey("triggers.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    hit_count = Column(BigInteger, default=0, server_default="0", nullable=False)
+    reply_count = Column(BigInteger, default=0, server_default="0", nullable=False)
+    last_fired_at = Column(DateTime, nullable=True)
+
+    # message received → reply sent (includes the human-like delay)
+    latency_total_ms = Column(BigInteger, default=0, server_default="0", nullable=False)
+    latency_max_ms = Column(BigInteger, default=0, server_default="0", nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
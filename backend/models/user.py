@@ -9,6 +9,8 @@ from sqlalchemy import (
     DateTime,
     Enum as SAEnum,
     BigInteger,
+    Index,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -30,6 +32,24 @@ class PlanEnum(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # stale worker reclamation (cron watchdog + reset-stale-workers)
+        Index(
+            "ix_users_active_last_seen_at",
+            "last_seen_at",
+            postgresql_where=text("worker_active"),
+        ),
+        # admin users list keyset pagination (backend/api/admin.py)
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # claim query (claimable_users_query in backend/api/users.py)
+        Index(
+            "ix_users_claimable",
+            "last_seen_at",
+            postgresql_where=text(
+                "is_registered IS TRUE AND (worker_active IS FALSE OR worker_id IS NULL)"
+            ),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
 
@@ -50,6 +70,10 @@ class User(Base):
     worker_id = Column(String, nullable=True, index=True)
     worker_active = Column(Boolean, default=False)
     last_seen_at = Column(DateTime, nullable=True)
+    # fencing token: bumped on every claim, heartbeat must present the current one
+    lease_epoch = Column(BigInteger, default=0, server_default="0", nullable=False)
+    # catch-up cursor: highest incoming message id the worker processed
+    last_processed_msg_id = Column(BigInteger, nullable=True)
 
     # plan
     plan = Column(
@@ -64,6 +88,8 @@ class User(Base):
 
     # triggers
     trigger_count = Column(Integer, default=0, nullable=False)
+    # bumped on every trigger create/update/delete (worker cache invalidation)
+    triggers_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     # =========================
     # RELATIONSHIPS
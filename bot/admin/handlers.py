@@ -8,13 +8,16 @@ from html import escape
 from bot.keyboards import main_menu
 
 from bot.config import BACKEND_URL
+from bot.broadcast import broadcast_runner, format_progress
+from bot.user_state import user_states
 from bot.admin.keyboards import (
     admin_main_kb,
     admin_users_kb,
     admin_admins_kb,
     admin_users_stats_kb,
     admin_user_gift_kb,
-    admin_users_pagination_kb
+    admin_users_pagination_kb,
+    broadcast_progress_kb,
 )
 from bot.admin.states import (
     AdminGiftState,
@@ -30,15 +33,15 @@ router = Router()
 #        HELPERS
 # ============================
 
-async def is_admin(telegram_id: int) -> bool:
-    async with httpx.AsyncClient(timeout=5) as client:
-        res = await client.get(f"{BACKEND_URL}/api/users/{telegram_id}")
-
-    if res.status_code != 200:
-        return False
+async def is_admin(telegram_id: int, user_state: dict | None = None) -> bool:
+    user = user_state
+    if user is None:
+        try:
+            user = await user_states.get(telegram_id)
+        except Exception:
+            return False
 
-    user = res.json()
-    return user.get("is_admin") is True
+    return bool(user) and user.get("is_admin") is True
 
 
 # ============================
@@ -46,11 +49,11 @@ async def is_admin(telegram_id: int) -> bool:
 # ============================
 
 @router.message(Command("admin"))
-async def admin_entry(message: Message, state: FSMContext):
+async def admin_entry(message: Message, state: FSMContext, user_state: dict | None = None):
     await state.clear()
     telegram_id = message.from_user.id
 
-    if not await is_admin(telegram_id):
+    if not await is_admin(telegram_id, user_state):
         await message.answer("❌ Siz admin emassiz")
         return
 
@@ -136,7 +139,6 @@ async def users_stats(message: Message):
 @router.message(F.text.startswith("📄 Userlar"))
 async def admin_users_list_message(message: Message):
     limit = 10
-    offset = 0
 
     async with httpx.AsyncClient() as client:
         res = await client.get(
@@ -144,7 +146,6 @@ async def admin_users_list_message(message: Message):
             params={
                 "requester_telegram_id": message.from_user.id,
                 "limit": limit,
-                "offset": offset,
             },
         )
 
@@ -173,7 +174,11 @@ async def admin_users_list_message(message: Message):
             "──────────────\n"
         )
 
-    await message.answer(text, parse_mode=None)
+    await message.answer(
+        text,
+        parse_mode=None,
+        reply_markup=admin_users_pagination_kb(None, data.get("next_cursor")),
+    )
 
 @router.callback_query(F.data == "admin_users")
 async def admin_users_callback(callback: CallbackQuery):
@@ -194,7 +199,7 @@ async def start_user_gift(message: Message, state: FSMContext):
 @router.callback_query(F.data.startswith("admin_users_page:"))
 async def admin_users_page(callback: CallbackQuery):
     limit = 10
-    offset = int(callback.data.split(":")[1])
+    _, direction, cursor = callback.data.split(":", 2)
 
     async with httpx.AsyncClient() as client:
         res = await client.get(
@@ -202,7 +207,8 @@ async def admin_users_page(callback: CallbackQuery):
             params={
                 "requester_telegram_id": callback.from_user.id,
                 "limit": limit,
-                "offset": offset,
+                "cursor": cursor,
+                "direction": "prev" if direction == "p" else "next",
             },
         )
 
@@ -212,7 +218,6 @@ async def admin_users_page(callback: CallbackQuery):
 
     data = res.json()
     users = data.get("items", [])
-    total = data.get("total", 0)
 
     if not users:
         await callback.answer("Userlar topilmadi", show_alert=True)
@@ -232,7 +237,9 @@ async def admin_users_page(callback: CallbackQuery):
     await callback.message.edit_text(
         text,
         parse_mode="HTML",
-        reply_markup=admin_users_pagination_kb(offset, limit, total),
+        reply_markup=admin_users_pagination_kb(
+            data.get("prev_cursor"), data.get("next_cursor")
+        ),
     )
     await callback.answer()
 
@@ -397,38 +404,54 @@ async def admin_back_main(message: Message, state: FSMContext):
 @router.message(AdminBroadcastState.waiting_for_message)
 async def process_admin_broadcast(message: Message, state: FSMContext):
     broadcast_text = message.html_text
+    await state.clear()
 
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            f"{BACKEND_URL}/api/admin/users",
-            params={
+    # progress xabari: runner uni tahrirlab boradi (restart’dan keyin ham)
+    progress = await message.answer("⏳ Broadcast tayyorlanmoqda...")
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        res = await client.post(
+            f"{BACKEND_URL}/api/broadcasts",
+            json={
                 "requester_telegram_id": message.from_user.id,
-                "limit": 100000,
-                "offset": 0,
+                "text": broadcast_text,
+                "progress_chat_id": progress.chat.id,
+                "progress_message_id": progress.message_id,
             },
         )
 
     if res.status_code != 200:
-        await message.answer("❌ Userlarni olishda xatolik")
+        await progress.edit_text("❌ Broadcast yaratilmadi")
+        await message.answer("🛠 <b>Admin panel</b>", reply_markup=admin_main_kb)
         return
 
-    data = res.json()
-    users = data.get("items", [])
-
-    sent = 0
-    for user in users:
-        try:
-            await message.bot.send_message(
-                chat_id=user["telegram_id"],
-                text=broadcast_text,
-                parse_mode="HTML",
-            )
-            sent += 1
-        except Exception:
-            continue
+    job = res.json()
+    await progress.edit_text(
+        format_progress(job),
+        parse_mode="HTML",
+        reply_markup=broadcast_progress_kb(job["id"]) if job["status"] == "pending" else None,
+    )
+    broadcast_runner.wake()
 
-    await state.clear()
     await message.answer(
-        f"✅ Broadcast yuborildi\n📨 Yuborilgan: {sent} ta user",
+        f"✅ Broadcast navbatga qo‘yildi\n👥 Qabul qiluvchilar: {job['total']} ta",
         reply_markup=admin_main_kb
     )
+
+
+@router.callback_query(F.data.startswith("broadcast_cancel:"))
+async def cancel_admin_broadcast(callback: CallbackQuery):
+    job_id = int(callback.data.split(":")[1])
+
+    async with httpx.AsyncClient() as client:
+        res = await client.post(
+            f"{BACKEND_URL}/api/broadcasts/{job_id}/cancel",
+            json={"requester_telegram_id": callback.from_user.id},
+        )
+
+    if res.status_code != 200:
+        await callback.answer("Xatolik", show_alert=True)
+        return
+
+    await callback.message.edit_text(format_progress(res.json()), parse_mode="HTML")
+    await callback.answer("⛔ Broadcast to‘xtatildi")
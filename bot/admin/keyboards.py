@@ -78,22 +78,23 @@ def admin_gift_kb(user_telegram_id: int):
 # PAGINATION KEYBOARD (USERS LIST)
 # ============================
 
-def admin_users_pagination_kb(offset: int, limit: int, total: int):
+def admin_users_pagination_kb(prev_cursor: str | None, next_cursor: str | None):
+    # cursor’lar backend’dan (keyset) — callback_data 64 baytga sig‘adi
     buttons = []
 
-    if offset > 0:
+    if prev_cursor:
         buttons.append(
             InlineKeyboardButton(
                 text="⬅️ Oldingi",
-                callback_data=f"admin_users_page:{offset - limit}"
+                callback_data=f"admin_users_page:p:{prev_cursor}"
             )
         )
 
-    if offset + limit < total:
+    if next_cursor:
         buttons.append(
             InlineKeyboardButton(
                 text="➡️ Keyingi",
-                callback_data=f"admin_users_page:{offset + limit}"
+                callback_data=f"admin_users_page:n:{next_cursor}"
             )
         )
 
@@ -107,6 +108,22 @@ def admin_users_pagination_kb(offset: int, limit: int, total: int):
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+# ============================
+# BROADCAST PROGRESS KEYBOARD
+# ============================
+
+def broadcast_progress_kb(job_id: int):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="⛔ To‘xtatish",
+                    callback_data=f"broadcast_cancel:{job_id}"
+                )
+            ]
+        ]
+    )
+
 # ============================
 # USERS STATS BACK KEYBOARD
 # ============================
@@ -0,0 +1,361 @@
+# bot/broadcast.py
+"""
+Broadcast runner: delivers admin announcements persisted by the backend
+(broadcast_jobs / broadcast_recipients).
+
+- one job at a time, leased via POST /api/broadcasts/claim; a restarted
+  bot re-claims its own job, another process takes it over once the
+  lease expires
+- recipients are paged from the backend (pending only), sent by
+  BROADCAST_CONCURRENCY senders through a global token bucket plus a
+  per-chat interval
+- TelegramRetryAfter pauses the whole bucket for retry_after and the
+  same recipient is retried; it never counts as a failed attempt
+- outcomes are flushed every BROADCAST_FLUSH_INTERVAL (which also
+  renews the lease); the flush response carries the job status, so a
+  cancel stops the run
+
+Outcomes not yet flushed when the process dies are resent after
+resume — at most BROADCAST_FLUSH_INTERVAL worth of messages.
+"""
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+import httpx
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from bot.admin.keyboards import broadcast_progress_kb
+from bot.config import (
+    BACKEND_URL,
+    BOT_INSTANCE_ID,
+    BROADCAST_RATE,
+    BROADCAST_BURST,
+    BROADCAST_PER_CHAT_INTERVAL,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_ATTEMPTS,
+    BROADCAST_PAGE_SIZE,
+    BROADCAST_FLUSH_INTERVAL,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ============================
+#        RATE LIMITS
+# ============================
+
+class TokenBucket:
+    """Global send rate. pause() empties it until retry_after has passed."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = max(rate, 0.1)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        # lock ichida kutamiz → kutayotganlar navbat bilan (FIFO) o‘tadi
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatLimiter:
+    """Minimum interval between two sends to the same chat."""
+
+    def __init__(self, interval: float, max_chats: int = 10_000) -> None:
+        self.interval = interval
+        self.max_chats = max_chats
+        self._next: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        allowed = self._next.get(chat_id, 0.0)
+        self._next[chat_id] = max(now, allowed) + self.interval
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+
+        if len(self._next) > self.max_chats:
+            self._next = {c: t for c, t in self._next.items() if t > now}
+
+
+# ============================
+#        PROGRESS
+# ============================
+
+STATUS_LABELS = {
+    "pending": "⏳ Navbatda",
+    "running": "🚀 Yuborilmoqda",
+    "done": "✅ Tugadi",
+    "cancelled": "⛔ To‘xtatildi",
+}
+
+
+def format_progress(job: dict) -> str:
+    done = job["sent"] + job["failed"] + job["blocked"]
+    percent = int(done * 100 / job["total"]) if job["total"] else 100
+    return (
+        f"📢 <b>Broadcast #{job['id']}</b>\n\n"
+        f"{STATUS_LABELS.get(job['status'], job['status'])} — {percent}%\n"
+        f"📨 Yuborildi: {job['sent']} / {job['total']}\n"
+        f"🚫 Bloklagan: {job['blocked']}\n"
+        f"❌ Xato: {job['failed']}"
+    )
+
+
+# ============================
+#        RUNNER
+# ============================
+
+class _LeaseLost(Exception):
+    pass
+
+
+class BroadcastRunner:
+    def __init__(self) -> None:
+        self.bot: Optional[Bot] = None
+        self._bucket = TokenBucket(BROADCAST_RATE, BROADCAST_BURST)
+        self._chats = ChatLimiter(BROADCAST_PER_CHAT_INTERVAL)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def start(self, bot: Bot) -> None:
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """New job created by this process — don't wait for the next poll."""
+        self._wakeup.set()
+
+    async def _run_forever(self) -> None:
+        async with httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=15,
+            headers={"X-Worker-ID": BOT_INSTANCE_ID},
+        ) as http:
+            self._http = http
+            while True:
+                self._wakeup.clear()
+                try:
+                    res = await http.post("/api/broadcasts/claim")
+                    res.raise_for_status()
+                    job = res.json()
+                    if job:
+                        await self._run_job(job)
+                        continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"⚠️ Broadcast runner error: {e!r}")
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), BROADCAST_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ---------- one job ----------
+
+    async def _run_job(self, job: dict) -> None:
+        job_id, text = job["id"], job["text"]
+        logger.warning(f"📢 Broadcast #{job_id} started ({job['pending']} pending)")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 4)
+        results: List[dict] = []
+        stop = asyncio.Event()
+
+        async def produce() -> None:
+            after = 0
+            while not stop.is_set():
+                res = await self._http.get(
+                    f"/api/broadcasts/{job_id}/pending",
+                    params={"after": after, "limit": BROADCAST_PAGE_SIZE},
+                )
+                res.raise_for_status()
+                page = res.json()
+                for telegram_id in page:
+                    await queue.put(telegram_id)
+                if len(page) < BROADCAST_PAGE_SIZE:
+                    break
+                after = page[-1]
+            for _ in range(BROADCAST_CONCURRENCY):
+                await queue.put(None)
+
+        async def send() -> None:
+            while True:
+                telegram_id = await queue.get()
+                if telegram_id is None or stop.is_set():
+                    return
+                outcome = await self._deliver(telegram_id, text)
+                # flush results’ni almashtirib qo‘ygan bo‘lishi mumkin → await’dan keyin
+                results.append(outcome)
+
+        async def flush(exhausted: bool = False) -> dict:
+            nonlocal results
+            batch, results = results, []
+            try:
+                res = await self._http.post(
+                    f"/api/broadcasts/{job_id}/results",
+                    json={"results": batch, "exhausted": exhausted},
+                )
+            except Exception:
+                results = batch + results
+                raise
+            if res.status_code == 409:
+                raise _LeaseLost()
+            if res.status_code != 200:
+                results = batch + results
+                res.raise_for_status()
+            return res.json()
+
+        producer = asyncio.create_task(produce())
+        senders = [asyncio.create_task(send()) for _ in range(BROADCAST_CONCURRENCY)]
+        sending = asyncio.gather(producer, *senders)
+
+        last_progress = 0.0
+        try:
+            while not sending.done():
+                await asyncio.wait({sending}, timeout=BROADCAST_FLUSH_INTERVAL)
+                if sending.done():
+                    break
+                # bo‘sh flush ham kerak: u lease’ni yangilaydi va cancel’ni olib keladi
+                try:
+                    job = await flush()
+                except _LeaseLost:
+                    raise
+                except Exception as e:
+                    logger.warning(f"⚠️ Broadcast #{job_id} flush failed: {e!r}")
+                    continue
+
+                if job["status"] != "running":
+                    break
+
+                now = time.monotonic()
+                if now - last_progress >= BROADCAST_PROGRESS_INTERVAL:
+                    last_progress = now
+                    await self._show_progress(job)
+
+            stop.set()
+            failed = sending.exception() if sending.done() else None
+            job = await flush(exhausted=sending.done() and failed is None)
+            await self._show_progress(job)
+            if failed is not None:
+                # producer xatosi: yuborilganlar saqlandi, keyingi claim davom ettiradi
+                raise failed
+            logger.warning(
+                f"📢 Broadcast #{job_id} {job['status']}: {job['sent']} sent, "
+                f"{job['blocked']} blocked, {job['failed']} failed"
+            )
+
+        except _LeaseLost:
+            logger.warning(f"⚠️ Broadcast #{job_id} lease lost, stopping")
+
+        finally:
+            stop.set()
+            tasks = [producer, *senders]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _deliver(self, telegram_id: int, text: str) -> dict:
+        attempts = 0
+        error = None
+
+        while attempts < BROADCAST_MAX_ATTEMPTS:
+            await self._chats.wait(telegram_id)
+            await self._bucket.acquire()
+            attempts += 1
+            try:
+                await self.bot.send_message(chat_id=telegram_id, text=text, parse_mode="HTML")
+                return {"telegram_id": telegram_id, "status": "sent", "attempts": attempts}
+
+            except TelegramRetryAfter as e:
+                # flood limit: hamma sender kutadi, urinish hisoblanmaydi
+                logger.warning(f"⏳ Broadcast flood wait {e.retry_after}s")
+                self._bucket.pause(e.retry_after)
+                attempts -= 1
+
+            except TelegramForbiddenError as e:
+                return {
+                    "telegram_id": telegram_id,
+                    "status": "blocked",
+                    "attempts": attempts,
+                    "error": e.message,
+                }
+
+            except TelegramBadRequest as e:
+                return {
+                    "telegram_id": telegram_id,
+                    "status": "failed",
+                    "attempts": attempts,
+                    "error": e.message,
+                }
+
+            except (TelegramNetworkError, TelegramServerError) as e:
+                error = e.message
+                await asyncio.sleep(min(2 ** attempts, 30))
+
+            except Exception as e:
+                error = repr(e)
+                break
+
+        return {"telegram_id": telegram_id, "status": "failed", "attempts": attempts, "error": error}
+
+    async def _show_progress(self, job: dict) -> None:
+        chat_id, message_id = job.get("progress_chat_id"), job.get("progress_message_id")
+        if not chat_id or not message_id:
+            return
+
+        await self._chats.wait(chat_id)
+        await self._bucket.acquire()
+        try:
+            await self.bot.edit_message_text(
+                format_progress(job),
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode="HTML",
+                reply_markup=broadcast_progress_kb(job["id"]) if job["status"] == "running" else None,
+            )
+        except TelegramRetryAfter as e:
+            self._bucket.pause(e.retry_after)
+        except Exception:
+            # progress — best-effort ("message is not modified" va h.k.)
+            pass
+
+
+broadcast_runner = BroadcastRunner()
@@ -1,5 +1,77 @@
 import os
+import socket
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 BACKEND_URL = os.getenv("BACKEND_URL")
-PUBLIC_BACKEND_URL = os.getenv("PUBLIC_BACKEND_URL")
\ No newline at end of file
+PUBLIC_BACKEND_URL = os.getenv("PUBLIC_BACKEND_URL")
+
+# ============================
+#        BROADCAST
+# ============================
+
+# job lease egasi (backend broadcast_jobs.runner_id) — restart’dan keyin
+# bir xil bo‘lsa, bot o‘z job’ini lease tugashini kutmasdan davom ettiradi
+BOT_INSTANCE_ID = os.getenv("BOT_INSTANCE_ID") or f"bot-{socket.gethostname()}"
+
+# Telegram: ~30 msg/s global, 1 msg/s bitta chatga → zaxira bilan
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 25))
+BROADCAST_BURST = int(os.getenv("BROADCAST_BURST", 5))
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv("BROADCAST_PER_CHAT_INTERVAL", 1.0))
+
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 8))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", 5))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 500))
+
+BROADCAST_FLUSH_INTERVAL = float(os.getenv("BROADCAST_FLUSH_INTERVAL", 2))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", 5))
+BROADCAST_POLL_INTERVAL = float(os.getenv("BROADCAST_POLL_INTERVAL", 15))
+
+
+# ============================
+#        USER STATE CACHE
+# ============================
+
+# GET /api/users/{id} natijasi: ulangan + worker aktiv holat uzoqroq,
+# o‘tish holatlari (worker hali claim qilmagan va h.k.) qisqa saqlanadi
+USER_STATE_TTL = float(os.getenv("USER_STATE_TTL", 30))
+USER_STATE_SHORT_TTL = float(os.getenv("USER_STATE_SHORT_TTL", 3))
+USER_STATE_MAX_ENTRIES = int(os.getenv("USER_STATE_MAX_ENTRIES", 50000))
+USER_STATE_STREAM_READ_TIMEOUT = float(os.getenv("USER_STATE_STREAM_READ_TIMEOUT", 60))
+
+
+# ============================
+#        WEBHOOK MODE
+# ============================
+
+# polling — lokal dev uchun; prod’da webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")  # https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+
+# bir process ichida bir vaqtda nechta update ishlanadi / navbatda turadi
+BOT_UPDATE_CONCURRENCY = int(os.getenv("BOT_UPDATE_CONCURRENCY", 32))
+BOT_UPDATE_MAX_PENDING = int(os.getenv("BOT_UPDATE_MAX_PENDING", 1000))
+
+# >1: webhook update’lari chat_id bo‘yicha shuncha process’ga taqsimlanadi
+BOT_PROCESSES = int(os.getenv("BOT_PROCESSES", 1))
+
+
+# ============================
+#        FSM STORAGE
+# ============================
+
+# backend — Postgres (backend orqali, replikalar o‘rtasida umumiy)
+# redis   — REDIS_URL (redis paketi kerak), memory — faqat lokal test
+FSM_STORAGE = os.getenv("FSM_STORAGE", "backend")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# ishlatilmay qolgan state shuncha vaqtdan keyin o‘chadi
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 86400))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 0.2))
+# get_state + get_data bitta update ichida bitta so‘rov bo‘lishi uchun
+FSM_READ_TTL = float(os.getenv("FSM_READ_TTL", 1.0))
@@ -0,0 +1,262 @@
+# bot/fsm_storage.py
+"""
+FSM storage shared by all bot replicas (FSM_STORAGE):
+
+- backend (default): Postgres table bot_fsm_states behind
+  /api/fsm/state and /api/fsm/batch
+- redis: aiogram's RedisStorage on REDIS_URL (needs the redis package),
+  e.g. a local Redis-compatible server in dev
+- memory: aiogram's in-process MemoryStorage
+
+BackendStorage:
+- writes are write-behind: collected per key and flushed every
+  FSM_FLUSH_INTERVAL as ONE batch; a failed flush keeps them for the
+  next one (unless the key was written again meanwhile)
+- reads return this process's unflushed writes first (including the
+  batch whose POST is still in flight); otherwise state
+  and data are fetched together (single-flight) and reused for
+  FSM_READ_TTL, so get_state + get_data of one update cost one request
+- every write renews the key's TTL (FSM_STATE_TTL); stale states are
+  swept by the backend
+
+Another replica may read a key up to FSM_FLUSH_INTERVAL + FSM_READ_TTL
+behind. In webhook fan-out mode one chat always stays on one process
+(bot/webhook.py), so that window only matters across hosts.
+"""
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import time
+
+import httpx
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.config import (
+    BACKEND_URL,
+    BOT_INSTANCE_ID,
+    FSM_STORAGE,
+    REDIS_URL,
+    FSM_STATE_TTL,
+    FSM_FLUSH_INTERVAL,
+    FSM_READ_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 6
+MAX_CACHED_RECORDS = 10_000
+
+
+def storage_key(key: StorageKey) -> str:
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(str(key.thread_id))
+    if key.business_connection_id:
+        parts.append(key.business_connection_id)
+    parts.append(key.destiny)
+    return ":".join(parts)
+
+
+class _Record:
+    __slots__ = ("state", "data", "fetched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]) -> None:
+        self.state = state
+        self.data = data
+        self.fetched_at = time.monotonic()
+
+
+class BackendStorage(BaseStorage):
+    def __init__(
+        self,
+        ttl: int = FSM_STATE_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        read_ttl: float = FSM_READ_TTL,
+    ) -> None:
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.read_ttl = read_ttl
+
+        self._records: Dict[str, _Record] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # key → {"state": ..., "data": ...} (faqat o‘zgargan maydonlar)
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        # POST qilinayotgan batch: commit bo‘lguncha o‘qishlar shundan oladi
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._closing = False
+        self._posting = False
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=BACKEND_URL,
+                timeout=HTTP_TIMEOUT,
+                headers={"X-Worker-ID": BOT_INSTANCE_ID},
+            )
+        return self._http
+
+    # ---------- reads ----------
+
+    async def _load(self, key: str) -> _Record:
+        record = self._records.get(key)
+        if record is not None and time.monotonic() - record.fetched_at < self.read_ttl:
+            return record
+
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, key: str) -> _Record:
+        # GET batch commit’idan oldin o‘qigan bo‘lishi mumkin → boshidagi holat ham ustun
+        before = (dict(self._flushing.get(key) or {}), dict(self._dirty.get(key) or {}))
+
+        res = await self._client().get("/api/fsm/state", params={"key": key})
+        res.raise_for_status()
+        body = res.json()
+
+        record = _Record(body.get("state"), body.get("data") or {})
+        # so‘rov davomida yozilgan, hali commit bo‘lmagan qiymatlar ustun
+        for pending in (*before, self._flushing.get(key), self._dirty.get(key)):
+            if not pending:
+                continue
+            if "state" in pending:
+                record.state = pending["state"]
+            if "data" in pending:
+                record.data = dict(pending["data"])
+
+        if len(self._records) >= MAX_CACHED_RECORDS:
+            now = time.monotonic()
+            self._records = {
+                k: r for k, r in self._records.items() if now - r.fetched_at < self.read_ttl
+            }
+        self._records[key] = record
+        return record
+
+    def _pending(self, key: str, field: str) -> tuple:
+        """(True, value) for a write not committed by the backend yet."""
+        for pending in (self._dirty.get(key), self._flushing.get(key)):
+            if pending is not None and field in pending:
+                return True, pending[field]
+        return False, None
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        k = storage_key(key)
+        found, state = self._pending(k, "state")
+        if found:
+            return state
+        return (await self._load(k)).state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        k = storage_key(key)
+        found, data = self._pending(k, "data")
+        if found:
+            return dict(data)
+        return dict((await self._load(k)).data)
+
+    # ---------- writes ----------
+
+    def _write(self, key: str, field: str, value: Any) -> None:
+        self._dirty.setdefault(key, {})[field] = value
+
+        record = self._records.get(key)
+        if record is not None:
+            setattr(record, field, value)
+
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        task = self._flush_task
+        if task is None or task.done() or task is asyncio.current_task():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(
+            storage_key(key),
+            "state",
+            state.state if isinstance(state, State) else state,
+        )
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._write(storage_key(key), "data", dict(data))
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> int:
+        if not self._dirty:
+            return 0
+
+        # swap: flush paytidagi yangi yozuvlar keyingi batch’ga tushadi
+        batch, self._dirty = self._dirty, {}
+        self._flushing = batch
+        items = [
+            {
+                "key": key,
+                "set_state": "state" in fields,
+                "state": fields.get("state"),
+                "set_data": "data" in fields,
+                "data": fields.get("data") or {},
+            }
+            for key, fields in batch.items()
+        ]
+
+        self._posting = True
+        try:
+            res = await self._client().post(
+                "/api/fsm/batch",
+                json={"ttl": self.ttl, "items": items},
+            )
+            res.raise_for_status()
+            # POST davomida kelgan yozuvlar → keyingi flush
+            if self._dirty and not self._closing:
+                self._schedule_flush()
+            return len(items)
+
+        except Exception as e:
+            logger.warning(f"⚠️ FSM flush failed ({len(items)} keys): {e!r}")
+            # yangiroq yozuv bo‘lsa o‘sha qoladi
+            for key, fields in batch.items():
+                current = self._dirty.setdefault(key, {})
+                for field, value in fields.items():
+                    current.setdefault(field, value)
+            if not self._closing:
+                self._schedule_flush()
+            return 0
+
+        finally:
+            self._posting = False
+            self._flushing = {}
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._flush_task is not None:
+            # yuborilayotgan batch’ni uzmaymiz, faqat kutishni bekor qilamiz
+            if not self._posting:
+                self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+def build_storage() -> BaseStorage:
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    if FSM_STORAGE == "redis":
+        # ixtiyoriy dependency: faqat shu rejimda kerak
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return RedisStorage.from_url(REDIS_URL, state_ttl=FSM_STATE_TTL, data_ttl=FSM_STATE_TTL)
+
+    return BackendStorage()
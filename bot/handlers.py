@@ -5,6 +5,7 @@ import httpx
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from .config import BACKEND_URL
+from .user_state import user_states
 from .keyboards import (
     main_menu,
     start_menu_kb,
@@ -33,28 +34,26 @@ class EditTriggerState(StatesGroup):
 
 
 
-async def ensure_account_connected(telegram_id: int, message_or_callback):
-    async with httpx.AsyncClient(timeout=5) as client:
-        res = await client.get(f"{BACKEND_URL}/api/users/{telegram_id}")
-
-    if res.status_code == 403:
-        await message_or_callback.answer(
-            "🔌 <b>Akkountingiz uzilgan</b>\n\n"
-            "Telegram qurilmalar bo‘limidan GhostReply qurulmasi o‘chirilgan.\n"
-            "Iltimos, akkountingizni qayta ulang.",
-            parse_mode="HTML",
-        )
-        return False
+async def ensure_account_connected(
+    telegram_id: int,
+    message_or_callback,
+    user_state: dict | None = None,
+):
+    # middleware allaqachon olgan bo‘lsa — qayta so‘ramaymiz
+    user = user_state
+    if user is None:
+        try:
+            user = await user_states.get(telegram_id)
+        except Exception:
+            user = None
 
-    if res.status_code != 200:
+    if user is None:
         await message_or_callback.answer(
             "❌ Akkount holatini tekshirib bo‘lmadi."
         )
         return False
 
-    user = res.json()
-
-    if not user.get("is_registered") or not user.get("session_string"):
+    if not user.get("is_registered") or not user.get("has_session"):
         await message_or_callback.answer(
             "🔐 Akkount ulanmagan yoki uzilgan.\n"
             "Iltimos, qayta ulang.",
@@ -88,20 +87,21 @@ async def start_cmd(message: Message, state: FSMContext):
             )
             return
 
-        res = await client.get(f"{BACKEND_URL}/api/users/{telegram_id}")
+    # register yangi user yaratgan bo‘lishi mumkin → cache’dagi "yo‘q"ni tashlaymiz
+    user_states.invalidate([telegram_id])
+    try:
+        user = await user_states.get(telegram_id)
+    except Exception:
+        user = None
 
-    if res.status_code != 200:
+    if user is None:
         await message.answer(
             "❌ Server bilan bog‘lanishda xatolik (get user)."
         )
         return
 
-    user = res.json()
-
     # 📱 If phone number is missing OR backend returned "not provided", request contact FIRST
-    phone = user.get("phone")
-
-    if not phone or phone == "not provided":
+    if not user.get("has_phone"):
         from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
         contact_kb = ReplyKeyboardMarkup(
@@ -166,6 +166,8 @@ async def save_contact(message: Message, state: FSMContext):
         await message.answer("❌ Telefonni saqlashda xatolik yuz berdi")
         return
 
+    user_states.invalidate([telegram_id])
+
     await state.clear()
     await message.answer(
         "👻 <b>GhostReply</b> ga xush kelibsiz!\n"
@@ -312,24 +314,25 @@ async def cancel_link_account(callback: CallbackQuery):
 async def check_account(callback: CallbackQuery, state: FSMContext):
     telegram_id = callback.from_user.id
 
-    async with httpx.AsyncClient(timeout=5) as client:
-        res = await client.get(f"{BACKEND_URL}/api/users/{telegram_id}")
+    # "Tekshirish" bosildi → cache emas, jonli holat (coalesce qilinadi)
+    try:
+        user = await user_states.get(telegram_id, fresh=True)
+    except Exception:
+        user = None
 
-    if res.status_code != 200:
+    if user is None:
         await callback.message.answer(
             "❌ Akkount holatini tekshirib bo‘lmadi. Keyinroq qayta urinib ko‘ring."
         )
         await callback.answer()
         return
 
-    user = res.json()
-
-    session_string = user.get("session_string")
+    has_session = user.get("has_session") is True
     is_registered = user.get("is_registered") is True
     worker_active = user.get("worker_active") is True
 
     # 1️⃣ Session yo‘q → HAQIQIY uzilish
-    if session_string is None:
+    if not has_session:
         await callback.message.answer(
             "🔌 <b>Akkountingiz uzilgan</b>\n\n"
             "Telegram qurilmalar bo‘limidan Ghost Reply sessiyasi o‘chirilgan.\n"
@@ -485,8 +488,8 @@ async def log_out(message: Message, state: FSMContext):
 # ============================
 
 @router.message(F.text == "➕ Trigger qo'shish")
-async def add_trigger_start(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def add_trigger_start(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         return
     await state.clear()
 
@@ -528,8 +531,8 @@ async def add_trigger_start(message: Message, state: FSMContext):
 
 
 @router.message(AddTriggerState.waiting_for_trigger)
-async def add_trigger_text(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def add_trigger_text(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         await state.clear()
         return
     text = message.text.lower().strip()
@@ -543,8 +546,8 @@ async def add_trigger_text(message: Message, state: FSMContext):
 
 
 @router.message(AddTriggerState.waiting_for_reply)
-async def add_trigger_reply(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def add_trigger_reply(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         await state.clear()
         return
     data = await state.get_data()
@@ -587,8 +590,8 @@ async def add_trigger_reply(message: Message, state: FSMContext):
 # ============================
 
 @router.message(F.text == "📄 Triggerlarim")
-async def list_triggers(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def list_triggers(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         return
     await state.clear()
     user_id = message.from_user.id
@@ -623,8 +626,8 @@ async def list_triggers(message: Message, state: FSMContext):
 # ============================
 
 @router.callback_query(F.data.startswith("trigger_open:"))
-async def open_trigger(callback: CallbackQuery, state: FSMContext):
-    if not await ensure_account_connected(callback.from_user.id, callback.message):
+async def open_trigger(callback: CallbackQuery, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(callback.from_user.id, callback.message, user_state):
         await callback.answer()
         return
     trigger_id_str = callback.data.split(":", 1)[1]
@@ -665,8 +668,8 @@ async def open_trigger(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("trigger_delete:"))
-async def confirm_delete_trigger(callback: CallbackQuery, state: FSMContext):
-    if not await ensure_account_connected(callback.from_user.id, callback.message):
+async def confirm_delete_trigger(callback: CallbackQuery, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(callback.from_user.id, callback.message, user_state):
         await callback.answer()
         return
     trigger_id_str = callback.data.split(":", 1)[1]
@@ -735,8 +738,8 @@ async def triggers_back(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("trigger_edit:"))
-async def edit_trigger_start(callback: CallbackQuery, state: FSMContext):
-    if not await ensure_account_connected(callback.from_user.id, callback.message):
+async def edit_trigger_start(callback: CallbackQuery, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(callback.from_user.id, callback.message, user_state):
         await callback.answer()
         return
     trigger_id_str = callback.data.split(":", 1)[1]
@@ -800,8 +803,8 @@ async def open_plans_message(message: Message, state: FSMContext):
 # ============================
 
 @router.message(EditTriggerState.waiting_for_trigger)
-async def edit_trigger_text(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def edit_trigger_text(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         await state.clear()
         return
     new_text = message.text.lower().strip()
@@ -815,8 +818,8 @@ async def edit_trigger_text(message: Message, state: FSMContext):
 
 
 @router.message(EditTriggerState.waiting_for_reply)
-async def edit_trigger_auto_save(message: Message, state: FSMContext):
-    if not await ensure_account_connected(message.from_user.id, message):
+async def edit_trigger_auto_save(message: Message, state: FSMContext, user_state: dict | None = None):
+    if not await ensure_account_connected(message.from_user.id, message, user_state):
         await state.clear()
         return
     data = await state.get_data()
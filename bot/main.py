@@ -5,28 +5,62 @@ from aiogram.types import BotCommand
 
 from bot.handlers import router
 from bot.admin.handlers import router as admin_router
-from bot.config import BOT_TOKEN
+from bot.config import BOT_TOKEN, BOT_MODE
+from bot.fsm_storage import build_storage
+from bot.broadcast import broadcast_runner
+from bot.user_state import user_states
 from .middleware import RegistrationMiddleware
 
 
-async def main():
-    print("🤖 Telegram BOT is running...")
-
-    bot = Bot(
+def build_bot() -> Bot:
+    return Bot(
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode="HTML")
     )
 
-    dp = Dispatcher()
+
+def build_dispatcher() -> Dispatcher:
+    # FSM holati restart’dan keyin ham, replikalar o‘rtasida ham saqlanadi
+    dp = Dispatcher(storage=build_storage())
 
     dp.message.middleware(RegistrationMiddleware())
     dp.callback_query.middleware(RegistrationMiddleware())
 
     dp.include_router(router)
     dp.include_router(admin_router)
+    return dp
+
+
+async def run_polling():
+    bot = build_bot()
+    dp = build_dispatcher()
+
+    # Telegram bitta bot uchun webhook yoki polling’dan faqat bittasini beradi
+    await bot.delete_webhook(drop_pending_updates=False)
+
+    # 📢 tugallanmagan broadcast’lar shu yerda davom etadi
+    broadcast_runner.start(bot)
+    # 🔁 backend user holati o‘zgarganda cache’ni tozalaydi
+    user_states.start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await broadcast_runner.stop()
+        await user_states.stop()
+        # yozilmagan FSM o‘zgarishlari flush bo‘lsin
+        await dp.storage.close()
+
+
+def main():
+    print(f"🤖 Telegram BOT is running ({BOT_MODE})...")
+
+    if BOT_MODE == "webhook":
+        from bot.webhook import run_webhook
 
-    await dp.start_polling(bot)
+        run_webhook()
+    else:
+        asyncio.run(run_polling())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
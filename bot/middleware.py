@@ -3,8 +3,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-import httpx
-from .config import BACKEND_URL
+from .user_state import user_states
 
 ALLOWED_CALLBACKS = {
     "start_instructions",
@@ -89,22 +88,26 @@ class RegistrationMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         # ------------- Backend check for BOTH Message and CallbackQuery -------------
+        # cache (TTL + single-flight); natija handler’larga data["user_state"] orqali
         try:
-            async with httpx.AsyncClient(timeout=6) as client:
-                res = await client.get(f"{BACKEND_URL}/api/users/{user_id}")
-                res.raise_for_status()
-                info = res.json()
+            info = await user_states.get(user_id)
         except Exception as e:
             # Backend down -> allow (yoki xohlasangiz blok qilamiz)
             print("⚠️ Backend unreachable:", e)
             return await handler(event, data)
 
+        if info is None:
+            # backend’da hali user yo‘q (/start qilmagan) — avvalgidek o‘tkazamiz
+            return await handler(event, data)
+
+        data["user_state"] = info
+
         is_registered = bool(info.get("is_registered", False))
         worker_active = bool(info.get("worker_active", False))
-        session_string = info.get("session_string")  # <- MUHIM
+        has_session = bool(info.get("has_session"))  # <- MUHIM
 
-        # --- Session truth: no session_string ALWAYS means disconnected
-        if not session_string:
+        # --- Session truth: no session ALWAYS means disconnected
+        if not has_session:
             worker_active = False
             is_registered = False
 
@@ -0,0 +1,100 @@
+# bot/updates.py
+"""
+Concurrent update handling for webhook mode.
+
+Updates of different chats run in parallel (at most `concurrency` at a
+time); updates of one chat run strictly one after another in arrival
+order, so FSM transitions of a user never race. `max_pending` bounds
+everything accepted but not finished yet — submit() waits when it is
+reached, which slows the webhook response down instead of growing memory.
+"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# chat’ni topish uchun update turlari (raw JSON kalitlari)
+_UPDATE_KINDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "poll_answer",
+)
+
+
+def chat_key(raw: dict) -> int:
+    """Chat id of a raw update (user id / update id as fallbacks)."""
+    for kind in _UPDATE_KINDS:
+        event = raw.get(kind)
+        if not event:
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        break
+    return raw.get("update_id", 0)
+
+
+class ChatOrderedPool:
+    def __init__(
+        self,
+        handle: Callable[[dict], Awaitable[None]],
+        concurrency: int,
+        max_pending: int,
+    ) -> None:
+        self._handle = handle
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._room = asyncio.Semaphore(max(max_pending, 1))
+        self._chats: Dict[int, Deque[dict]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.pending = 0
+
+    async def submit(self, key: int, raw: dict) -> None:
+        await self._room.acquire()
+        self.pending += 1
+
+        queue = self._chats.get(key)
+        if queue is not None:
+            # shu chat allaqachon ishlanmoqda → navbatining oxiriga
+            queue.append(raw)
+            return
+
+        self._chats[key] = deque([raw])
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, key: int) -> None:
+        queue = self._chats[key]
+        try:
+            while queue:
+                try:
+                    async with self._slots:
+                        await self._handle(queue[0])
+                except Exception:
+                    logger.exception(f"Update handling failed (chat={key})")
+                finally:
+                    queue.popleft()
+                    self.pending -= 1
+                    self._room.release()
+        finally:
+            del self._chats[key]
+
+    async def close(self, timeout: float) -> None:
+        """Let accepted updates finish (graceful shutdown)."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in list(self._tasks):
+            task.cancel()
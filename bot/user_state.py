@@ -0,0 +1,196 @@
+# bot/user_state.py
+"""
+Per-process cache of GET /api/users/{id}/status (what RegistrationMiddleware
+and the handlers decide on: booleans only, no session_string).
+
+- TTL: USER_STATE_TTL for connected accounts, USER_STATE_SHORT_TTL for
+  transitional ones (not registered yet, worker not claimed yet) and for
+  everything while the invalidation stream is down
+- single-flight: concurrent lookups of one user share one request
+- an expired entry is revalidated with If-None-Match; 304 just extends it
+- invalidation: SSE /api/events/user-state (backend NOTIFY on
+  registration, session revoke, worker disconnect, release, phone,
+  plan and admin changes); a reconnect drops the whole cache, since
+  events may have been missed meanwhile
+"""
+from typing import Dict, Iterable, Optional, Tuple
+import asyncio
+import json
+import logging
+import random
+import time
+
+import httpx
+
+from bot.config import (
+    BACKEND_URL,
+    BOT_INSTANCE_ID,
+    USER_STATE_TTL,
+    USER_STATE_SHORT_TTL,
+    USER_STATE_MAX_ENTRIES,
+    USER_STATE_STREAM_READ_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 6
+
+
+def _is_settled(info: Optional[dict]) -> bool:
+    return bool(
+        info
+        and info.get("has_session")
+        and info.get("is_registered")
+        and info.get("worker_active")
+    )
+
+
+class UserStateCache:
+    def __init__(self) -> None:
+        # telegram_id → (expires_at, info); info None = user not found
+        self._entries: Dict[int, Tuple[float, Optional[dict]]] = {}
+        # revalidation uchun oxirgi javob (TTL tugagandan keyin ham)
+        self._etags: Dict[int, Tuple[str, dict]] = {}
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._stream_connected = False
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=BACKEND_URL, timeout=HTTP_TIMEOUT)
+        return self._http
+
+    async def get(self, telegram_id: int, fresh: bool = False) -> Optional[dict]:
+        """
+        None: user does not exist in the backend. Raises on backend errors
+        (nothing is cached then).
+        """
+        if not fresh:
+            entry = self._entries.get(telegram_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+        fut = self._inflight.get(telegram_id)
+        if fut is None:
+            self.misses += 1
+            fut = asyncio.ensure_future(self._fetch(telegram_id))
+            self._inflight[telegram_id] = fut
+            fut.add_done_callback(lambda f, tid=telegram_id: self._store(tid, f))
+
+        # bitta caller cancel bo‘lsa ham so‘rov boshqalar uchun davom etadi
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, telegram_id: int) -> Optional[dict]:
+        cached = self._etags.get(telegram_id)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        res = await self._client().get(f"/api/users/{telegram_id}/status", headers=headers)
+        if res.status_code == 304 and cached:
+            self.revalidated += 1
+            return cached[1]
+        if res.status_code == 404:
+            self._etags.pop(telegram_id, None)
+            return None
+        res.raise_for_status()
+
+        info = res.json()
+        etag = res.headers.get("ETag")
+        if etag:
+            self._etags[telegram_id] = (etag, info)
+        return info
+
+    def _store(self, telegram_id: int, fut: asyncio.Future) -> None:
+        # invalidate() so‘rov davomida kelgan bo‘lsa, eski javobni saqlamaymiz
+        if self._inflight.get(telegram_id) is not fut:
+            return
+        del self._inflight[telegram_id]
+
+        if fut.cancelled() or fut.exception() is not None:
+            return
+
+        info = fut.result()
+        ttl = USER_STATE_TTL if self._stream_connected and _is_settled(info) else USER_STATE_SHORT_TTL
+
+        if len(self._entries) >= USER_STATE_MAX_ENTRIES:
+            self._prune()
+        self._entries[telegram_id] = (time.monotonic() + ttl, info)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._entries = {tid: e for tid, e in self._entries.items() if e[0] > now}
+        self._etags = {tid: e for tid, e in self._etags.items() if tid in self._entries}
+        if len(self._entries) >= USER_STATE_MAX_ENTRIES:
+            self._entries.clear()
+            self._etags.clear()
+
+    def invalidate(self, telegram_ids: Iterable[int]) -> None:
+        for tid in telegram_ids:
+            self._entries.pop(tid, None)
+            self._etags.pop(tid, None)
+            self._inflight.pop(tid, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._etags.clear()
+        self._inflight.clear()
+
+    # ---------- invalidation stream ----------
+
+    def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _listen(self) -> None:
+        backoff = 1.0
+
+        while True:
+            try:
+                async with self._client().stream(
+                    "GET",
+                    "/api/events/user-state",
+                    headers={"X-Worker-ID": BOT_INSTANCE_ID},
+                    timeout=httpx.Timeout(HTTP_TIMEOUT, read=USER_STATE_STREAM_READ_TIMEOUT),
+                ) as res:
+                    res.raise_for_status()
+                    # uzilish paytida o‘tkazib yuborilgan eventlar uchun
+                    self.clear()
+                    self._stream_connected = True
+                    backoff = 1.0
+
+                    async for line in res.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        try:
+                            payload = json.loads(line[len("data: "):])
+                            self.invalidate(payload.get("telegram_ids", ()))
+                        except ValueError:
+                            continue
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ User state stream error: {e!r}")
+
+            finally:
+                self._stream_connected = False
+
+            await asyncio.sleep(backoff + random.uniform(0, backoff))
+            backoff = min(backoff * 2, 60)
+
+
+user_states = UserStateCache()
@@ -0,0 +1,313 @@
+# bot/webhook.py
+"""
+Webhook mode (BOT_MODE=webhook, WEBHOOK_BASE_URL set):
+
+    python -m bot.main
+
+BOT_PROCESSES=1: one aiohttp app → ChatOrderedPool (bot/updates.py) →
+dp.feed_raw_update in this process.
+
+BOT_PROCESSES>1: this process only receives webhooks and fans raw
+updates out by chat_id % BOT_PROCESSES to child processes, each with its
+own dispatcher and pool. One chat always lands in the same child, so a
+user's updates stay ordered and never race a sibling's unflushed FSM
+writes (bot/fsm_storage.py). Dead children are respawned with backoff
+on a fresh queue: a child killed inside queue.get() can leave the old
+queue's read lock held, so updates still queued for it are dropped.
+Only child 0 runs the broadcast runner, so the global send rate is not
+multiplied.
+
+Telegram gets 200 as soon as an update is accepted.
+"""
+from typing import Awaitable, Callable, Dict
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+
+from aiohttp import web
+
+from bot.config import (
+    BOT_INSTANCE_ID,
+    BOT_PROCESSES,
+    BOT_UPDATE_CONCURRENCY,
+    BOT_UPDATE_MAX_PENDING,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+)
+from bot.updates import ChatOrderedPool, chat_key
+
+logger = logging.getLogger(__name__)
+
+# shutdown: qabul qilingan update’lar shuncha vaqt ichida tugashi kerak
+DRAIN_TIMEOUT = 25
+RESPAWN_BACKOFF = 1.0
+MAX_RESPAWN_BACKOFF = 60
+# to‘la navbatga put shuncha kutadi, keyin navbat almashganini tekshiradi
+PUT_TIMEOUT = 1.0
+
+_ctx = mp.get_context("spawn")
+
+
+# ============================
+#        HTTP APP
+# ============================
+
+def _make_app(accept: Callable[[dict], Awaitable[None]]) -> web.Application:
+    async def webhook(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and (
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET
+        ):
+            return web.Response(status=401)
+
+        raw = await request.json()
+        await accept(raw)
+        return web.Response()
+
+    async def health(_request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, webhook)
+    app.router.add_get("/health", health)
+    return app
+
+
+async def _set_webhook(bot, dp) -> None:
+    if not WEBHOOK_BASE_URL:
+        raise RuntimeError("WEBHOOK_BASE_URL is required in webhook mode")
+
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=False,
+    )
+    logger.warning(f"🔗 Webhook set: {WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+
+async def _serve(app: web.Application, stop: asyncio.Event) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    logger.warning(f"🌐 Webhook server on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+    await stop.wait()
+    return runner
+
+
+def _stop_event() -> asyncio.Event:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+# ============================
+#        SINGLE PROCESS
+# ============================
+
+async def _run_single() -> None:
+    from bot.broadcast import broadcast_runner
+    from bot.main import build_bot, build_dispatcher
+    from bot.user_state import user_states
+
+    bot = build_bot()
+    dp = build_dispatcher()
+    pool = ChatOrderedPool(
+        lambda raw: dp.feed_raw_update(bot, raw),
+        BOT_UPDATE_CONCURRENCY,
+        BOT_UPDATE_MAX_PENDING,
+    )
+
+    async def accept(raw: dict) -> None:
+        await pool.submit(chat_key(raw), raw)
+
+    broadcast_runner.start(bot)
+    user_states.start()
+    stop = _stop_event()
+    try:
+        await _set_webhook(bot, dp)
+        runner = await _serve(_make_app(accept), stop)
+        # yangi update qabul qilmaymiz, borlarini tugatamiz
+        await runner.cleanup()
+        await pool.close(DRAIN_TIMEOUT)
+    finally:
+        await broadcast_runner.stop()
+        await user_states.stop()
+        await dp.storage.close()
+        await bot.session.close()
+
+
+# ============================
+#        FAN-OUT (BOT_PROCESSES > 1)
+# ============================
+
+def _child_main(index: int, updates) -> None:
+    # Ctrl+C butun guruhga boradi — to‘xtatishni parent boshqaradi
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_child(index, updates))
+
+
+async def _child(index: int, updates) -> None:
+    from bot.broadcast import broadcast_runner
+    from bot.main import build_bot, build_dispatcher
+    from bot.user_state import user_states
+
+    bot = build_bot()
+    dp = build_dispatcher()
+    pool = ChatOrderedPool(
+        lambda raw: dp.feed_raw_update(bot, raw),
+        BOT_UPDATE_CONCURRENCY,
+        BOT_UPDATE_MAX_PENDING,
+    )
+    loop = asyncio.get_running_loop()
+
+    if index == 0:
+        broadcast_runner.start(bot)
+    user_states.start()
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, updates.get)
+            if raw is None:
+                break
+            await pool.submit(chat_key(raw), raw)
+
+        await pool.close(DRAIN_TIMEOUT)
+    finally:
+        await broadcast_runner.stop()
+        await user_states.stop()
+        await dp.storage.close()
+        await bot.session.close()
+
+
+class _FanOut:
+    def __init__(self, processes: int) -> None:
+        self.processes = processes
+        self.queues: Dict[int, mp.Queue] = {
+            i: _ctx.Queue(maxsize=BOT_UPDATE_MAX_PENDING) for i in range(processes)
+        }
+        self.procs: Dict[int, mp.Process] = {}
+        self.backoff: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        # child bot.config’ni o‘z BOT_INSTANCE_ID’si bilan import qiladi
+        previous = os.environ.get("BOT_INSTANCE_ID")
+        os.environ["BOT_INSTANCE_ID"] = f"{BOT_INSTANCE_ID}-{index}"
+        try:
+            proc = _ctx.Process(
+                target=_child_main,
+                args=(index, self.queues[index]),
+                name=f"bot-{index}",
+            )
+            proc.start()
+        finally:
+            if previous is None:
+                os.environ.pop("BOT_INSTANCE_ID", None)
+            else:
+                os.environ["BOT_INSTANCE_ID"] = previous
+
+        self.procs[index] = proc
+        logger.warning(f"🐣 Bot process {index} started (pid={proc.pid})")
+
+    def _replace_queue(self, index: int) -> None:
+        old = self.queues[index]
+        self.queues[index] = _ctx.Queue(maxsize=BOT_UPDATE_MAX_PENDING)
+        try:
+            lost = old.qsize()
+        except NotImplementedError:  # macOS
+            lost = 0
+        # o‘lik child lock’ni ushlab qolgan bo‘lishi mumkin → eski navbatni tashlaymiz
+        old.cancel_join_thread()
+        old.close()
+        if lost:
+            logger.warning(f"🗑 Bot process {index}: dropped {lost} queued updates")
+
+    async def accept(self, raw: dict) -> None:
+        index = chat_key(raw) % self.processes
+        loop = asyncio.get_running_loop()
+        while True:
+            updates = self.queues[index]
+            try:
+                # navbat to‘lsa kutamiz → webhook javobi sekinlashadi (backpressure)
+                await loop.run_in_executor(None, updates.put, raw, True, PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+            except ValueError:
+                # respawn paytida yopilgan navbat → yangisiga
+                if self.queues[index] is updates:
+                    raise
+
+    async def watch(self) -> None:
+        started: Dict[int, float] = {i: time.monotonic() for i in self.procs}
+        while not self.stopping:
+            await asyncio.sleep(1)
+            for index, proc in list(self.procs.items()):
+                if proc.is_alive() or self.stopping:
+                    continue
+
+                logger.error(f"💀 Bot process {index} exited (code={proc.exitcode})")
+                # uzoq ishlagan process → backoff qaytadan
+                if time.monotonic() - started.get(index, 0) > MAX_RESPAWN_BACKOFF:
+                    self.backoff[index] = RESPAWN_BACKOFF
+                delay = self.backoff.get(index, RESPAWN_BACKOFF)
+                self.backoff[index] = min(delay * 2, MAX_RESPAWN_BACKOFF)
+
+                await asyncio.sleep(delay)
+                if not self.stopping:
+                    self._replace_queue(index)
+                    self.spawn(index)
+                    started[index] = time.monotonic()
+
+    async def stop(self) -> None:
+        self.stopping = True
+        loop = asyncio.get_running_loop()
+        for updates in self.queues.values():
+            try:
+                await loop.run_in_executor(None, updates.put, None, True, DRAIN_TIMEOUT)
+            except queue.Full:
+                pass
+        for proc in self.procs.values():
+            await loop.run_in_executor(None, proc.join, DRAIN_TIMEOUT + 5)
+            if proc.is_alive():
+                proc.terminate()
+
+
+async def _run_fan_out(processes: int) -> None:
+    from bot.main import build_bot, build_dispatcher
+
+    fan_out = _FanOut(processes)
+    for index in range(processes):
+        fan_out.spawn(index)
+    watcher = asyncio.create_task(fan_out.watch())
+
+    # parent faqat webhook’ni o‘rnatadi va update’larni tarqatadi
+    bot = build_bot()
+    stop = _stop_event()
+    try:
+        await _set_webhook(bot, build_dispatcher())
+        runner = await _serve(_make_app(fan_out.accept), stop)
+        await runner.cleanup()
+    finally:
+        watcher.cancel()
+        await fan_out.stop()
+        await bot.session.close()
+
+
+def run_webhook() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    if BOT_PROCESSES > 1:
+        asyncio.run(_run_fan_out(BOT_PROCESSES))
+    else:
+        asyncio.run(_run_single())
@@ -0,0 +1,140 @@
+# worker/admission.py
+"""
+Admission controller: how many accounts this worker process may run.
+
+Capacity is derived from what running clients actually cost:
+
+- memory: (RSS - baseline RSS) / running clients, against this process's
+  share of the memory budget (cgroup limit or WORKER_MEMORY_BUDGET_MB)
+- CPU: process CPU time / wall time per client, against WORKER_CPU_TARGET
+
+Until ADMISSION_MIN_SAMPLE clients are running there is nothing to
+measure, so ADMISSION_INITIAL_CAPACITY is used. MAX_ACTIVE_TASKS stays
+as a hard ceiling.
+"""
+from typing import Optional
+import asyncio
+import logging
+import os
+import resource
+import time
+
+from worker import metrics
+from worker.config import (
+    MAX_ACTIVE_TASKS,
+    ADMISSION_INITIAL_CAPACITY,
+    ADMISSION_MIN_SAMPLE,
+    ADMISSION_SAMPLE_INTERVAL,
+    WORKER_MEMORY_BUDGET_MB,
+    WORKER_MEMORY_HEADROOM,
+    WORKER_CPU_TARGET,
+)
+from worker.sharding import shard
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# EWMA smoothing for per-client cost
+ALPHA = 0.3
+
+_CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",                    # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # linux’da KB, peak qiymat — yomonroq, lekin bor
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _memory_budget_bytes() -> Optional[int]:
+    if WORKER_MEMORY_BUDGET_MB > 0:
+        return int(WORKER_MEMORY_BUDGET_MB * MB)
+
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            continue
+        # "max" / ulkan son → limit yo‘q
+        if raw.isdigit() and int(raw) < 1 << 60:
+            return int(raw)
+    return None
+
+
+class AdmissionController:
+    def __init__(self) -> None:
+        self.baseline_rss = _rss_bytes()
+        self.budget = _memory_budget_bytes()
+        self.per_client_mem: Optional[float] = None
+        self.per_client_cpu: Optional[float] = None
+        self.capacity = min(ADMISSION_INITIAL_CAPACITY, MAX_ACTIVE_TASKS)
+        self._last_cpu = time.process_time()
+        self._last_wall = time.monotonic()
+
+        metrics.gauge("admission.capacity", lambda: self.capacity)
+        metrics.gauge("admission.rss_mb", lambda: round(_rss_bytes() / MB, 1))
+        metrics.gauge(
+            "admission.per_client_mb",
+            lambda: round((self.per_client_mem or 0) / MB, 2),
+        )
+        metrics.gauge(
+            "admission.per_client_cpu",
+            lambda: round(self.per_client_cpu or 0, 4),
+        )
+
+    @staticmethod
+    def _ewma(old: Optional[float], new: float) -> float:
+        return new if old is None else old + ALPHA * (new - old)
+
+    def sample(self, running: int) -> None:
+        now_cpu, now_wall = time.process_time(), time.monotonic()
+        cpu_share = (now_cpu - self._last_cpu) / max(now_wall - self._last_wall, 1e-6)
+        self._last_cpu, self._last_wall = now_cpu, now_wall
+
+        if running < ADMISSION_MIN_SAMPLE:
+            return
+
+        used = max(_rss_bytes() - self.baseline_rss, 0)
+        self.per_client_mem = self._ewma(self.per_client_mem, used / running)
+        self.per_client_cpu = self._ewma(self.per_client_cpu, cpu_share / running)
+        self.capacity = self._compute_capacity()
+
+    def _compute_capacity(self) -> int:
+        limits = [MAX_ACTIVE_TASKS]
+
+        if self.budget and self.per_client_mem:
+            # supervisor rejimida budget process’lar orasida bo‘linadi
+            share = self.budget / max(len(shard.members), 1)
+            free = share * (1 - WORKER_MEMORY_HEADROOM) - self.baseline_rss
+            limits.append(int(max(free, 0) / self.per_client_mem))
+
+        if self.per_client_cpu:
+            limits.append(int(WORKER_CPU_TARGET / self.per_client_cpu))
+
+        return max(min(limits), 0)
+
+    def free_slots(self, running: int) -> int:
+        return max(self.capacity - running, 0)
+
+    async def run(self, shutdown: asyncio.Event, running) -> None:
+        """running: callable → number of accounts currently started."""
+        while not shutdown.is_set():
+            await asyncio.sleep(ADMISSION_SAMPLE_INTERVAL)
+            previous = self.capacity
+            self.sample(running())
+            if self.capacity != previous:
+                logger.info(
+                    f"🎚 Admission capacity {previous} → {self.capacity} "
+                    f"(per client: {(self.per_client_mem or 0) / MB:.1f} MB, "
+                    f"cpu {self.per_client_cpu or 0:.4f})"
+                )
+
+
+admission = AdmissionController()
@@ -0,0 +1,143 @@
+# worker/backend_client.py
+"""
+Process-wide pooled HTTP client for worker → backend calls.
+
+Every worker path (claim, heartbeat, triggers, revocation) goes through
+ONE keep-alive pool instead of opening a fresh httpx.AsyncClient per call.
+"""
+from __future__ import annotations
+from typing import Optional
+import asyncio
+import logging
+import random
+
+import httpx
+
+from worker import metrics
+from worker.config import (
+    BACKEND_URL,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP2_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+# Request was never sent → safe to retry for ANY method
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_client: Optional[httpx.AsyncClient] = None
+_in_flight = 0
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("⚠️ HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def _pool_connections() -> list:
+    # httpcore internals — only used for metrics, never for control flow
+    try:
+        return list(_client._transport._pool.connections)
+    except Exception:
+        return []
+
+
+def get_http() -> httpx.AsyncClient:
+    global _client
+
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=HTTP_TIMEOUT,
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+        metrics.gauge("http.in_flight", lambda: _in_flight)
+        metrics.gauge("http.pool.connections", lambda: len(_pool_connections()))
+        metrics.gauge(
+            "http.pool.idle",
+            lambda: sum(1 for c in _pool_connections() if c.is_idle()),
+        )
+        metrics.gauge("http.pool.max", lambda: HTTP_MAX_CONNECTIONS)
+
+    return _client
+
+
+async def backend_request(
+    method: str,
+    path: str,
+    *,
+    retry_unsafe: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send a request to the backend with bounded retries.
+
+    - connect/pool errors are retried for every method (nothing was sent)
+    - read errors and 502/503/504 are retried only for idempotent methods,
+      or when the caller passes retry_unsafe=True
+    """
+    global _in_flight
+
+    method = method.upper()
+    can_retry_sent = retry_unsafe or method in IDEMPOTENT_METHODS
+    http = get_http()
+    attempt = 0
+
+    while True:
+        _in_flight += 1
+        started = asyncio.get_running_loop().time()
+        try:
+            res = await http.request(method, path, **kwargs)
+        except _NOT_SENT_ERRORS as e:
+            error = e
+            retryable = True
+        except httpx.TransportError as e:
+            error = e
+            retryable = can_retry_sent
+        else:
+            error = None
+            retryable = can_retry_sent and res.status_code in RETRY_STATUS_CODES
+        finally:
+            _in_flight -= 1
+            metrics.observe("http.latency", asyncio.get_running_loop().time() - started)
+
+        metrics.inc("http.requests")
+
+        if not retryable or attempt >= HTTP_MAX_RETRIES:
+            if error is not None:
+                metrics.inc("http.errors")
+                raise error
+            return res
+
+        attempt += 1
+        metrics.inc("http.retries")
+        delay = HTTP_BACKOFF_BASE * (2 ** (attempt - 1))
+        await asyncio.sleep(delay + random.uniform(0, delay))
+
+
+async def close_http() -> None:
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,136 @@
+# worker/catch_up.py
+"""
+Catch-up of private messages that arrived while an account had no client
+(revoked, worker crash, rebalance, deploy).
+
+On connect the worker knows the account's persisted cursor
+(users.last_processed_msg_id, returned by claim). Dialogs are walked
+newest-first and every private incoming message newer than the cursor
+(and younger than CATCHUP_MAX_AGE) goes through the same
+trigger_engine.process_message path as live events, CATCHUP_BATCH
+messages at a time. The dedup store (worker/dedup.py) makes overlap
+with live updates harmless.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+
+from worker import cursors, metrics
+from worker.config import (
+    CATCHUP_CONCURRENCY,
+    CATCHUP_MAX_AGE,
+    CATCHUP_MAX_DIALOGS,
+    CATCHUP_PER_CHAT,
+    CATCHUP_BATCH,
+    CATCHUP_BATCH_PAUSE,
+)
+from worker.trigger_engine import process_message
+
+logger = logging.getLogger(__name__)
+
+# dialog / history so‘rovlari: bir vaqtda nechta account catch-up qiladi
+_slots = asyncio.Semaphore(CATCHUP_CONCURRENCY)
+
+
+async def _init_cursor(client, telegram_id: int) -> None:
+    """First ownership: start from the newest message, never answer history."""
+    # faqat private box (user + oddiy group): channel/supergroup id’lari
+    # boshqa sanoqda → cursor’ga tushsa floor live xabarlarni yutib yuboradi.
+    # pinned dialog eng yangisi bo‘lmasligi mumkin
+    async for dialog in client.iter_dialogs(limit=CATCHUP_MAX_DIALOGS):
+        if dialog.pinned or dialog.is_channel or dialog.message is None:
+            continue
+        cursors.advance(telegram_id, dialog.message.id)
+        break
+
+
+async def _missed_messages(client, telegram_id: int, since_id: int):
+    """Yields (dialog, message) oldest-first per chat."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=CATCHUP_MAX_AGE)
+
+    async for dialog in client.iter_dialogs(limit=CATCHUP_MAX_DIALOGS):
+        top = dialog.message
+        if top is None:
+            continue
+
+        # dialoglar yangi → eski tartibda (pinned’lardan tashqari).
+        # channel message id’lari kanalning o‘ziga tegishli → faqat sana bo‘yicha
+        if not dialog.pinned:
+            if top.date < cutoff:
+                break
+            if not dialog.is_channel and top.id <= since_id:
+                break
+
+        if not dialog.is_user or top.id <= since_id:
+            continue
+
+        missed = []
+        async for message in client.iter_messages(
+            dialog.input_entity,
+            min_id=since_id,
+            limit=CATCHUP_PER_CHAT,
+        ):
+            if message.out or not message.text or message.date < cutoff:
+                continue
+            if message.sender_id == telegram_id:
+                continue
+            missed.append(message)
+
+        for message in reversed(missed):
+            yield dialog, message
+
+
+async def catch_up(
+    client,
+    telegram_id: int,
+    since_id: Optional[int],
+    on_revoked: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> int:
+    """Returns the number of missed messages pushed through the matcher."""
+    async with _slots:
+        try:
+            if since_id is None:
+                await _init_cursor(client, telegram_id)
+                return 0
+
+            started = asyncio.get_running_loop().time()
+            processed = replied = 0
+
+            async for dialog, message in _missed_messages(client, telegram_id, since_id):
+                peer = dialog.input_entity
+
+                async def _resolve_peer(peer=peer):
+                    return peer
+
+                if await process_message(
+                    client,
+                    telegram_id,
+                    chat_id=dialog.id,
+                    message_id=message.id,
+                    raw_text=message.text,
+                    resolve_peer=_resolve_peer,
+                    on_revoked=on_revoked,
+                ):
+                    replied += 1
+
+                processed += 1
+                if processed % CATCHUP_BATCH == 0:
+                    await asyncio.sleep(CATCHUP_BATCH_PAUSE)
+
+            metrics.inc("catch_up.messages", processed)
+            metrics.inc("catch_up.replies", replied)
+            metrics.observe("catch_up.duration", asyncio.get_running_loop().time() - started)
+            if processed:
+                logger.info(
+                    f"📬 Catch-up for {telegram_id}: {processed} missed messages, "
+                    f"{replied} replies"
+                )
+            return processed
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.inc("catch_up.failed")
+            logger.warning(f"⚠️ Catch-up failed for {telegram_id}: {e!r}")
+            return 0
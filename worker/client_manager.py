@@ -1,40 +1,142 @@
 from __future__ import annotations
 from typing import Dict
 import asyncio
-import httpx
+import logging
+import random
+import time
 
-from telethon import TelegramClient, events
-from telethon.errors import AuthKeyUnregisteredError, SessionRevokedError
-from telethon.sessions import StringSession
+from telethon import TelegramClient, events, functions
+from telethon.errors import (
+    AuthKeyUnregisteredError,
+    FloodWaitError,
+    SessionRevokedError,
+    UnauthorizedError,
+)
+from worker import cursors, metrics, session_cache
+from worker.config import (
+    API_ID,
+    API_HASH,
+    LIVENESS_PROBE_INTERVAL,
+    CONNECT_CONCURRENCY,
+    CONNECT_JITTER,
+    CONNECT_MAX_RETRIES,
+    CONNECT_BACKOFF_BASE,
+    CONNECT_MAX_FLOOD_WAIT,
+)
+from worker.dedup import dedup
+from worker.reply_scheduler import reply_scheduler
+from worker.session_loader import report_session_revoked
+from worker.trigger_engine import handle_incoming_message, forget_matcher
 
-from worker.config import API_ID, API_HASH, BACKEND_URL
-from worker.trigger_engine import handle_incoming_message
+logger = logging.getLogger(__name__)
 
 _clients: Dict[int, TelegramClient] = {}
+# telegram_id -> session fingerprint (rotation check + session cache key)
+_fingerprints: Dict[int, str] = {}
 
+# ============================
+#     LIVENESS
+# ============================
 
-async def monitor_session_revoked(telegram_id: int, client: TelegramClient) -> None:
+PROBE_TICK = 5
+PROBE_TIMEOUT = 15
+
+# telegram_id -> monotonic time of the last update / successful ping
+_last_activity: Dict[int, float] = {}
+# telegram_id -> monotonic time when the prober may look at it again
+_next_probe: Dict[int, float] = {}
+
+
+def _jittered(interval: float) -> float:
+    return interval * random.uniform(0.8, 1.2)
+
+
+def _mark_activity(telegram_id: int) -> None:
+    _last_activity[telegram_id] = time.monotonic()
+
+
+def _watch_disconnect(telegram_id: int, client: TelegramClient) -> None:
     """
-    Background guard: detects REAL Telegram-side revocation.
+    Telethon disconnect signal: no polling needed to notice a dropped
+    connection, start_client() wakes up from run_until_disconnected().
     """
-    while True:
-        try:
-            await client.get_me()
-            await asyncio.sleep(10)
+    def _on_disconnected(fut) -> None:
+        if not fut.cancelled():
+            fut.exception()  # mark as retrieved, start_client logs real errors
+        metrics.inc("liveness.disconnects")
+        _next_probe.pop(telegram_id, None)
+        logger.info(f"📴 Telegram connection closed for {telegram_id}")
 
-        except (AuthKeyUnregisteredError, SessionRevokedError):
-            async with httpx.AsyncClient(timeout=5) as http:
-                await http.post(
-                    f"{BACKEND_URL}/api/users/session-revoked/{telegram_id}"
+    try:
+        client.disconnected.add_done_callback(_on_disconnected)
+    except Exception:
+        pass
+
+
+async def revoke_session(telegram_id: int) -> None:
+    """
+    The ONLY revocation path: report to backend, then drop the client.
+    """
+    logger.warning(f"🔌 Session revoked for {telegram_id}")
+    metrics.inc("liveness.revoked")
+    try:
+        await report_session_revoked(telegram_id)
+    except Exception as e:
+        logger.error(f"❌ Failed to report revocation for {telegram_id}: {e}")
+    fp = _fingerprints.get(telegram_id)
+    await drop_client(telegram_id)
+    session_cache.forget(fp)
+
+
+async def liveness_prober(shutdown: asyncio.Event) -> None:
+    """
+    One prober per worker process.
+
+    Accounts that received updates recently are alive by definition
+    (Telegram only pushes updates to authorized keys), so the API ping
+    is sent only to idle accounts, at a jittered LIVENESS_PROBE_INTERVAL.
+    """
+    while not shutdown.is_set():
+        now = time.monotonic()
+
+        for telegram_id, client in list(_clients.items()):
+            if _next_probe.get(telegram_id, 0) > now:
+                continue
+            _next_probe[telegram_id] = now + _jittered(LIVENESS_PROBE_INTERVAL)
+
+            # disconnected → start_client handles it, nothing to ping
+            if not client.is_connected():
+                continue
+
+            if now - _last_activity.get(telegram_id, 0) < LIVENESS_PROBE_INTERVAL:
+                metrics.inc("liveness.skipped_active")
+                continue
+
+            try:
+                await asyncio.wait_for(
+                    client(functions.updates.GetStateRequest()),
+                    PROBE_TIMEOUT,
                 )
-            await drop_client(telegram_id)
-            return
+                metrics.inc("liveness.pings")
+                _mark_activity(telegram_id)
 
-        except Exception:
-            await asyncio.sleep(10)
+            except (AuthKeyUnregisteredError, SessionRevokedError, UnauthorizedError):
+                await revoke_session(telegram_id)
+
+            except Exception as e:
+                logger.warning(f"⚠️ Liveness probe error for {telegram_id}: {e}")
+
+        await asyncio.sleep(PROBE_TICK)
 
 
 async def drop_client(telegram_id: int) -> None:
+    forget_matcher(telegram_id)
+    cursors.forget(telegram_id)
+    dedup.forget(telegram_id)
+    reply_scheduler.cancel_user(telegram_id)
+    _last_activity.pop(telegram_id, None)
+    _next_probe.pop(telegram_id, None)
+    _fingerprints.pop(telegram_id, None)
     client = _clients.pop(telegram_id, None)
     if client:
         try:
@@ -43,6 +145,113 @@ async def drop_client(telegram_id: int) -> None:
             pass
 
 
+async def drop_all_clients(timeout: float) -> int:
+    """Shutdown: disconnect every client concurrently (bounded by timeout)."""
+    telegram_ids = list(_clients)
+    if not telegram_ids:
+        return 0
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(drop_client(tid) for tid in telegram_ids)),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱ Disconnect timed out, {len(_clients)} clients left")
+    return len(telegram_ids)
+
+
+# ============================
+#     CONNECT WARM-UP
+# ============================
+
+_connect_slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+_connecting = 0
+
+# startup: process start → first / all claimed accounts connected
+_startup_t0 = time.monotonic()
+_startup_first: float | None = None
+_startup_all: float | None = None
+
+metrics.gauge("connect.in_progress", lambda: _connecting)
+metrics.gauge("startup.first_connected_s", lambda: _startup_first or 0.0)
+metrics.gauge("startup.all_connected_s", lambda: _startup_all or 0.0)
+
+
+def warm_up_order(users: list[dict]) -> list[dict]:
+    """Jittered order: batches of a cold start never hit Telegram in claim order."""
+    users = list(users)
+    random.shuffle(users)
+    return users
+
+
+def _record_startup(connected: bool) -> None:
+    global _startup_first, _startup_all
+    elapsed = time.monotonic() - _startup_t0
+
+    if connected and _startup_first is None:
+        _startup_first = round(elapsed, 2)
+        logger.info(f"🏁 First account connected {_startup_first}s after start")
+
+    if _connecting == 0 and _startup_first is not None and _startup_all is None:
+        _startup_all = round(elapsed, 2)
+        logger.info(f"🏁 All claimed accounts connected {_startup_all}s after start")
+
+
+async def _connect(telegram_id: int, client: TelegramClient) -> bool:
+    """
+    connect + auth check with at most CONNECT_CONCURRENCY handshakes in
+    flight. FloodWaitError → wait what Telegram asks (slot released);
+    network errors → exponential backoff. Returns is_user_authorized().
+    """
+    global _connecting
+    _connecting += 1
+    started = time.monotonic()
+    connected = False
+
+    try:
+        if not client.is_connected():
+            await asyncio.sleep(random.uniform(0, CONNECT_JITTER))
+
+        for attempt in range(CONNECT_MAX_RETRIES + 1):
+            try:
+                async with _connect_slots:
+                    if not client.is_connected():
+                        await client.connect()
+                    authorized = await client.is_user_authorized()
+
+                connected = True
+                metrics.observe("connect.latency", time.monotonic() - started)
+                return authorized
+
+            except FloodWaitError as e:
+                metrics.inc("connect.flood_wait")
+                if e.seconds > CONNECT_MAX_FLOOD_WAIT or attempt == CONNECT_MAX_RETRIES:
+                    raise
+                logger.warning(f"🐢 FloodWait {e.seconds}s on connect for {telegram_id}")
+                await asyncio.sleep(e.seconds + random.uniform(0, CONNECT_JITTER))
+
+            except (OSError, ConnectionError) as e:
+                if attempt == CONNECT_MAX_RETRIES:
+                    raise
+                delay = CONNECT_BACKOFF_BASE * (2 ** attempt)
+                logger.warning(
+                    f"🔁 Connect retry {attempt + 1} for {telegram_id} in {delay:.0f}s: {e!r}"
+                )
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+            metrics.inc("connect.retries")
+
+        return False  # unreachable: last attempt raises
+
+    except Exception:
+        metrics.inc("connect.failed")
+        raise
+
+    finally:
+        _connecting -= 1
+        _record_startup(connected)
+
+
 async def get_or_create_client(
     telegram_id: int,
     session_string: str,
@@ -58,35 +267,55 @@ async def get_or_create_client(
     if not worker_active:
         await drop_client(telegram_id)
         return None
+    fp = session_cache.fingerprint(session_string)
+
     # 1️⃣ Existing cached client
     if telegram_id in _clients:
         client = _clients[telegram_id]
 
         # 🔁 Session rotated (user re-login) → recreate client
-        if client.session.save() != session_string:
+        if _fingerprints.get(telegram_id) != fp:
             await drop_client(telegram_id)
         else:
-            if not client.is_connected():
-                await client.connect()
+            was_connected = client.is_connected()
 
-            if not await client.is_user_authorized():
+            if not await _connect(telegram_id, client):
                 await drop_client(telegram_id)
                 raise SessionRevokedError(request=None)
 
+            if not was_connected:
+                _watch_disconnect(telegram_id, client)
+
             return client
 
     # 2️⃣ Create fresh client
-    client = TelegramClient(StringSession(session_string), API_ID, API_HASH)
-    await client.connect()
+    # SESSION_CACHE_DIR → entities / update state from the last owner on this host
+    client = TelegramClient(session_cache.open_session(session_string), API_ID, API_HASH)
+    try:
+        authorized = await _connect(telegram_id, client)
+    except Exception:
+        await client.disconnect()
+        raise
 
-    if not await client.is_user_authorized():
+    if not authorized:
+        await client.disconnect()
         await drop_client(telegram_id)
+        session_cache.forget(fp)
         raise AuthKeyUnregisteredError(request=None)
 
     @client.on(events.NewMessage(incoming=True))
     async def _on_new_message(event: events.NewMessage.Event):
-        await handle_incoming_message(client, event, telegram_id)
+        await handle_incoming_message(
+            client, event, telegram_id, on_revoked=revoke_session
+        )
+
+    # 💓 any update = account is alive → prober skips the API ping
+    @client.on(events.Raw)
+    async def _on_update(_update):
+        _mark_activity(telegram_id)
 
     _clients[telegram_id] = client
-    asyncio.create_task(monitor_session_revoked(telegram_id, client))
+    _fingerprints[telegram_id] = fp
+    _mark_activity(telegram_id)
+    _watch_disconnect(telegram_id, client)
     return client
\ No newline at end of file
@@ -4,13 +4,80 @@ import uuid
 API_ID = int(os.getenv("TELEGRAM_API_ID"))
 API_HASH = os.getenv("TELEGRAM_API_HASH")
 
+# claim polling: WORKER_POLL_INTERVAL while the claim event stream is down,
+# CLAIM_FALLBACK_POLL_INTERVAL while it is up (events do the real work)
 WORKER_POLL_INTERVAL = int(os.getenv("WORKER_POLL_INTERVAL", 8))
+CLAIM_FALLBACK_POLL_INTERVAL = int(os.getenv("CLAIM_FALLBACK_POLL_INTERVAL", 60))
+CLAIM_DEBOUNCE = float(os.getenv("CLAIM_DEBOUNCE", 1))
+CLAIM_STREAM_READ_TIMEOUT = float(os.getenv("CLAIM_STREAM_READ_TIMEOUT", 45))
 WORKER_LOG_LEVEL = os.getenv("WORKER_LOG_LEVEL", "INFO")
 TRIGGER_CACHE_TTL = int(os.getenv("TRIGGER_CACHE_TTL", 10))
+LIVENESS_PROBE_INTERVAL = float(os.getenv("LIVENESS_PROBE_INTERVAL", 60))
+TRIGGER_VERSION_POLL_INTERVAL = float(os.getenv("TRIGGER_VERSION_POLL_INTERVAL", 1))
 
 WORKER_ID = os.getenv("WORKER_ID", str(uuid.uuid4()))
+# stop serving accounts when heartbeats fail this long (< backend CLAIM_STALE_AFTER=45s)
+LEASE_TIMEOUT = float(os.getenv("LEASE_TIMEOUT", 40))
+# MAX_CLIENTS: max accounts per claim request
+# MAX_ACTIVE_TASKS: hard ceiling, real capacity comes from worker/admission.py
 MAX_CLIENTS = int(os.getenv("MAX_CLIENTS", 50))
-MAX_ACTIVE_TASKS = int(os.getenv("MAX_ACTIVE_TASKS", 20))
+MAX_ACTIVE_TASKS = int(os.getenv("MAX_ACTIVE_TASKS", 200))
+
+# Admission controller (measured per-client memory / CPU)
+ADMISSION_INITIAL_CAPACITY = int(os.getenv("ADMISSION_INITIAL_CAPACITY", 20))
+ADMISSION_MIN_SAMPLE = int(os.getenv("ADMISSION_MIN_SAMPLE", 5))
+ADMISSION_SAMPLE_INTERVAL = float(os.getenv("ADMISSION_SAMPLE_INTERVAL", 30))
+WORKER_MEMORY_BUDGET_MB = float(os.getenv("WORKER_MEMORY_BUDGET_MB", 0))  # 0 → cgroup limit
+WORKER_MEMORY_HEADROOM = float(os.getenv("WORKER_MEMORY_HEADROOM", 0.2))
+WORKER_CPU_TARGET = float(os.getenv("WORKER_CPU_TARGET", 0.7))
+
+# Multi-process supervisor (python -m worker.supervisor)
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))
+SHARD_BUCKETS = int(os.getenv("SHARD_BUCKETS", 256))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", 64))
+SUPERVISOR_RESPAWN_BACKOFF = float(os.getenv("SUPERVISOR_RESPAWN_BACKOFF", 2))
+
+# Telethon connect warm-up (bounded MTProto handshakes)
+CONNECT_CONCURRENCY = int(os.getenv("CONNECT_CONCURRENCY", 5))
+CONNECT_JITTER = float(os.getenv("CONNECT_JITTER", 1.0))
+CONNECT_MAX_RETRIES = int(os.getenv("CONNECT_MAX_RETRIES", 3))
+CONNECT_BACKOFF_BASE = float(os.getenv("CONNECT_BACKOFF_BASE", 2))
+CONNECT_MAX_FLOOD_WAIT = float(os.getenv("CONNECT_MAX_FLOOD_WAIT", 300))
+
+# Optional local Telethon session store (entities + update state); empty → off
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR", "")
+SESSION_CACHE_MAX_AGE = int(os.getenv("SESSION_CACHE_MAX_AGE", 7 * 24 * 3600))
+SESSION_CACHE_MAX_FILES = int(os.getenv("SESSION_CACHE_MAX_FILES", 2000))
+
+# Catch-up of messages missed while an account had no client
+CATCHUP_CONCURRENCY = int(os.getenv("CATCHUP_CONCURRENCY", 3))
+CATCHUP_MAX_AGE = int(os.getenv("CATCHUP_MAX_AGE", 3600))
+CATCHUP_MAX_DIALOGS = int(os.getenv("CATCHUP_MAX_DIALOGS", 100))
+CATCHUP_PER_CHAT = int(os.getenv("CATCHUP_PER_CHAT", 20))
+CATCHUP_BATCH = int(os.getenv("CATCHUP_BATCH", 20))
+CATCHUP_BATCH_PAUSE = float(os.getenv("CATCHUP_BATCH_PAUSE", 0.5))
+
+# Delayed trigger replies
+REPLY_DEDUP_WINDOW = int(os.getenv("REPLY_DEDUP_WINDOW", 1000))  # per account
+REPLY_QUEUE_MAX = int(os.getenv("REPLY_QUEUE_MAX", 1000))
+REPLY_MAX_PER_USER = int(os.getenv("REPLY_MAX_PER_USER", 50))
+REPLY_SEND_CONCURRENCY = int(os.getenv("REPLY_SEND_CONCURRENCY", 10))
+
+# Graceful drain (SIGTERM): keep the total below the container stop grace period
+REPLY_DRAIN_TIMEOUT = float(os.getenv("REPLY_DRAIN_TIMEOUT", 10))
+DISCONNECT_TIMEOUT = float(os.getenv("DISCONNECT_TIMEOUT", 5))
+
+# Shared backend HTTP pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.3))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", 60))
+TRIGGER_STATS_FLUSH_INTERVAL = float(os.getenv("TRIGGER_STATS_FLUSH_INTERVAL", 30))
 
 BACKEND_URL = os.getenv(
     "BACKEND_URL",
@@ -0,0 +1,46 @@
+# worker/cursors.py
+"""
+Per-account message cursor.
+
+cursor: highest incoming private message id that went through the
+matcher (private-chat message ids are sequential per account). It is
+persisted via the heartbeat / release batch (users.last_processed_msg_id)
+and drives catch-up after a reconnect (worker/catch_up.py).
+
+floor: the persisted cursor at claim time. Private messages at or below
+it were already handled by a previous owner of the account.
+"""
+from typing import Dict, Iterable, Optional
+
+_cursors: Dict[int, int] = {}
+_floors: Dict[int, int] = {}
+
+
+def get(telegram_id: int) -> Optional[int]:
+    return _cursors.get(telegram_id)
+
+
+def advance(telegram_id: int, msg_id: Optional[int]) -> None:
+    if msg_id is None:
+        return
+    if msg_id > _cursors.get(telegram_id, 0):
+        _cursors[telegram_id] = msg_id
+
+
+def snapshot(telegram_ids: Iterable[int]) -> Dict[int, int]:
+    return {tid: _cursors[tid] for tid in telegram_ids if tid in _cursors}
+
+
+def set_floor(telegram_id: int, msg_id: Optional[int]) -> None:
+    if msg_id is not None:
+        _floors[telegram_id] = msg_id
+    advance(telegram_id, msg_id)
+
+
+def below_floor(telegram_id: int, msg_id: int) -> bool:
+    return msg_id <= _floors.get(telegram_id, 0)
+
+
+def forget(telegram_id: int) -> None:
+    _cursors.pop(telegram_id, None)
+    _floors.pop(telegram_id, None)
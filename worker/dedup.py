@@ -0,0 +1,86 @@
+# worker/dedup.py
+"""
+Reply idempotency: which (chat_id, msg_id) an account already handled.
+
+Per account a fixed-size ring buffer (insertion order) plus a set (O(1)
+lookup) of the last REPLY_DEDUP_WINDOW messages. Checked before a
+message can reach the reply scheduler, so duplicated updates, catch-up
+overlapping live events and reconnect replays never double-reply.
+Cross-worker duplicates are covered by the catch-up cursor floor
+(worker/cursors.py) and lease fencing.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+from worker import metrics
+from worker.config import REPLY_DEDUP_WINDOW
+
+Key = Tuple[int, int]
+
+
+class _Ring:
+    __slots__ = ("items", "keys", "pos")
+
+    def __init__(self) -> None:
+        self.items: List[Optional[Key]] = []
+        self.keys: Set[Key] = set()
+        self.pos = 0
+
+
+class DedupStore:
+    def __init__(self, window: int = REPLY_DEDUP_WINDOW) -> None:
+        self.window = max(window, 1)
+        self._rings: Dict[int, _Ring] = {}
+        self._size = 0
+        self._checks = 0
+        self._hits = 0
+
+        metrics.gauge("dedup.size", lambda: self._size)
+        metrics.gauge("dedup.accounts", lambda: len(self._rings))
+        metrics.gauge("dedup.checks", lambda: self._checks)
+        metrics.gauge("dedup.hits", lambda: self._hits)
+        metrics.gauge(
+            "dedup.hit_rate",
+            lambda: round(self._hits / self._checks, 4) if self._checks else 0.0,
+        )
+
+    def seen(self, telegram_id: int, chat_id: int, msg_id: int) -> bool:
+        """True if already handled; otherwise records it and returns False."""
+        self._checks += 1
+        key = (chat_id, msg_id)
+
+        ring = self._rings.get(telegram_id)
+        if ring is None:
+            ring = self._rings[telegram_id] = _Ring()
+
+        if key in ring.keys:
+            self._hits += 1
+            return True
+
+        if len(ring.items) < self.window:
+            ring.items.append(key)
+            self._size += 1
+        else:
+            # eng eskisini ustiga yozamiz
+            ring.keys.discard(ring.items[ring.pos])
+            ring.items[ring.pos] = key
+            ring.pos = (ring.pos + 1) % self.window
+
+        ring.keys.add(key)
+        return False
+
+    def release(self, telegram_id: int, chat_id: int, msg_id: int) -> None:
+        """Handling failed before a reply was queued → the message may be tried again."""
+        ring = self._rings.get(telegram_id)
+        key = (chat_id, msg_id)
+        if ring is None or key not in ring.keys:
+            return
+        ring.keys.discard(key)
+        ring.items[ring.items.index(key)] = None
+
+    def forget(self, telegram_id: int) -> None:
+        ring = self._rings.pop(telegram_id, None)
+        if ring is not None:
+            self._size -= len(ring.items)
+
+
+dedup = DedupStore()
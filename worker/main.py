@@ -1,86 +1,138 @@
 # worker/main.py
+from typing import Optional
 import asyncio
 import logging
+import os
+import queue
 import signal
 
-import httpx
-from telethon.errors import AuthKeyUnregisteredError, SessionRevokedError, UnauthorizedError
+from telethon.errors import (
+    AuthKeyUnregisteredError,
+    FloodWaitError,
+    SessionRevokedError,
+    UnauthorizedError,
+)
 
-from worker.session_loader import claim_users_for_worker
-from worker.client_manager import get_or_create_client
-from worker.utils import setup_shutdown_hooks
+from worker.session_loader import (
+    claim_users_for_worker,
+    claim_event_listener,
+    claim_stream_connected,
+    release_accounts,
+)
+from worker.client_manager import (
+    drop_all_clients,
+    drop_client,
+    get_or_create_client,
+    liveness_prober,
+    revoke_session,
+    warm_up_order,
+)
+from worker.sharding import shard
+from worker import cursors, metrics, session_cache, trigger_stats
+from worker.catch_up import catch_up
+from worker.admission import admission
+from worker.trigger_engine import trigger_version_watcher
+from worker.reply_scheduler import reply_scheduler
+from worker.backend_client import backend_request, close_http
+from worker.metrics import metrics_reporter
 from worker.config import (
     WORKER_ID,
     WORKER_POLL_INTERVAL,
-    MAX_ACTIVE_TASKS,
-    BACKEND_URL,
+    CLAIM_FALLBACK_POLL_INTERVAL,
+    CLAIM_DEBOUNCE,
+    METRICS_LOG_INTERVAL,
+    LEASE_TIMEOUT,
+    REPLY_DRAIN_TIMEOUT,
+    DISCONNECT_TIMEOUT,
 )
 
 # Timing config (seconds)
 HEARTBEAT_INTERVAL = 15
-SESSION_CHECK_INTERVAL = 25
-IDLE_SLEEP = 8
 ERROR_SLEEP = 10
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-setup_shutdown_hooks()
-
 ACTIVE_TASKS: dict[int, asyncio.Task] = {}
+# authorized & running accounts → included in the heartbeat batch
+ALIVE_CLIENTS: set[int] = set()
+# telegram_id -> lease_epoch from claim (fencing token sent with heartbeats)
+LEASES: dict[int, int] = {}
 SHUTDOWN_EVENT = asyncio.Event()
+# set by claim events (SSE) and by freed slots → claim loop wakes up
+CLAIM_WAKEUP = asyncio.Event()
+_shutdown_task: Optional[asyncio.Task] = None
 
 
 async def reset_stale_workers_on_startup():
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            await client.post(f"{BACKEND_URL}/api/users/reset-stale-workers")
-            logger.info("♻️ Stale workers reset on startup")
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to reset stale workers on startup: {e}")
-
+    try:
+        await backend_request("POST", "/api/users/reset-stale-workers")
+        logger.info("♻️ Stale workers reset on startup")
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to reset stale workers on startup: {e}")
+
+
+async def drop_lost_leases(telegram_ids: list[int]) -> None:
+    """
+    Another worker owns these accounts now: disconnect immediately, no
+    release (the rows are not ours any more).
+    """
+    for telegram_id in telegram_ids:
+        LEASES.pop(telegram_id, None)
+        ALIVE_CLIENTS.discard(telegram_id)
+    await asyncio.gather(*(drop_client(tid) for tid in telegram_ids))
+    metrics.inc("lease.lost", len(telegram_ids))
+
+
+async def heartbeat_scheduler():
+    """
+    ONE heartbeat task per worker process: every interval all alive
+    accounts are sent to the backend in a single batch, fenced by the
+    lease epoch of each account.
+    """
+    loop = asyncio.get_running_loop()
+    last_ok = loop.time()
 
-async def heartbeat_loop(telegram_id: int):
-    async with httpx.AsyncClient(timeout=5) as client:
-        while not SHUTDOWN_EVENT.is_set():
+    while not SHUTDOWN_EVENT.is_set():
+        if not ALIVE_CLIENTS:
+            last_ok = loop.time()
+        else:
+            leases = {tid: LEASES[tid] for tid in sorted(ALIVE_CLIENTS) if tid in LEASES}
             try:
-                await client.post(
-                    f"{BACKEND_URL}/api/users/heartbeat/{telegram_id}"
+                res = await backend_request(
+                    "POST",
+                    "/api/users/heartbeat",
+                    json={
+                        "worker_id": WORKER_ID,
+                        "leases": leases,
+                        # 📬 catch-up cursor’lari shu batch bilan saqlanadi
+                        "cursors": cursors.snapshot(leases),
+                    },
+                    retry_unsafe=True,
                 )
+                res.raise_for_status()
+                last_ok = loop.time()
+                rejected = res.json().get("rejected", [])
+                if rejected:
+                    # 🪓 lease boshqa worker’da → darhol to‘xtaymiz
+                    logger.warning(f"🪓 Lease lost for {rejected}, dropping clients")
+                    await drop_lost_leases(rejected)
             except Exception as e:
-                logger.warning(f"💔 Heartbeat failed for {telegram_id}: {e}")
-            await asyncio.sleep(HEARTBEAT_INTERVAL)
-
-
-
-async def session_monitor(client, telegram_id: int):
-    async with httpx.AsyncClient(timeout=5) as http:
-        while not SHUTDOWN_EVENT.is_set():
-            if not client.is_connected():
-                break
+                logger.warning(
+                    f"💔 Heartbeat batch failed ({len(leases)} accounts): {e}"
+                )
 
-            try:
-                # REAL API ping (revoked bo‘lsa shu yerda yiqiladi)
-                await client.get_me()
-            except (AuthKeyUnregisteredError, SessionRevokedError, UnauthorizedError):
-                logger.warning(f"🔌 Session revoked (monitor API) for {telegram_id}")
-
-                # ikkalasini ham uramiz: session + worker status
-                try:
-                    await http.post(f"{BACKEND_URL}/api/users/session-revoked/{telegram_id}")
-                    await http.post(f"{BACKEND_URL}/api/users/worker-disconnected/{telegram_id}")
-                except Exception:
-                    pass
-
-                try:
-                    await client.disconnect()
-                except Exception:
-                    pass
-                break
-            except Exception as e:
-                logger.warning(f"⚠️ Session monitor error for {telegram_id}: {e}")
+            # backend’ga yetolmasak ham stale oynasidan oldin o‘zimizni to‘xtatamiz
+            if ALIVE_CLIENTS and loop.time() - last_ok > LEASE_TIMEOUT:
+                logger.error(
+                    f"🪓 No heartbeat for {LEASE_TIMEOUT}s, leases may be lost: "
+                    f"dropping {len(ALIVE_CLIENTS)} clients"
+                )
+                metrics.inc("lease.self_fenced", len(ALIVE_CLIENTS))
+                await hand_off_accounts(sorted(ALIVE_CLIENTS))
+                last_ok = loop.time()
 
-            await asyncio.sleep(SESSION_CHECK_INTERVAL)
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
 
 
 async def start_client(user: dict):
@@ -88,112 +140,262 @@ async def start_client(user: dict):
     session_string = user["session_string"]
 
     logger.info(f"🚀 Starting client for {telegram_id}")
-
-    monitor_task = None
-    heartbeat_task = None
+    catch_up_task = None
 
     try:
         client = await get_or_create_client(telegram_id, session_string)
 
         if not await client.is_user_authorized():
             logger.warning(f"🔌 Session invalid at startup for {telegram_id}")
-            async with httpx.AsyncClient(timeout=5) as http:
-                await http.post(
-                    f"{BACKEND_URL}/api/users/session-revoked/{telegram_id}"
-                )
+            await revoke_session(telegram_id)
             return
 
         logger.info(f"🟢 Telegram session alive for {telegram_id}")
 
-        # 🔥 Start heartbeat ONLY after successful auth
-        heartbeat_task = asyncio.create_task(heartbeat_loop(telegram_id))
-
-        monitor_task = asyncio.create_task(
-            session_monitor(client, telegram_id)
+        # 🔥 Heartbeat ONLY after successful auth
+        # (liveness is checked by the shared liveness_prober)
+        # worker_loop shu orada qayta claim qilgan bo‘lishi mumkin (epoch faqat o‘sadi)
+        LEASES[telegram_id] = max(LEASES.get(telegram_id, 0), user.get("lease_epoch", 0))
+        ALIVE_CLIENTS.add(telegram_id)
+
+        # 📬 client yo‘qligida kelgan xabarlar (persisted cursor’dan keyin)
+        since_id = user.get("last_processed_msg_id")
+        cursors.set_floor(telegram_id, since_id)
+        catch_up_task = asyncio.create_task(
+            catch_up(client, telegram_id, since_id, on_revoked=revoke_session)
         )
 
         await client.run_until_disconnected()
 
     except (AuthKeyUnregisteredError, SessionRevokedError, UnauthorizedError):
-        logger.warning(f"🔌 Session revoked for {telegram_id}")
-        async with httpx.AsyncClient(timeout=5) as http:
-            await http.post(f"{BACKEND_URL}/api/users/session-revoked/{telegram_id}")
-            await http.post(f"{BACKEND_URL}/api/users/worker-disconnected/{telegram_id}")
+        await revoke_session(telegram_id)
+
+    except FloodWaitError as e:
+        # uzoq flood wait → account’ni ushlab o‘tirmaymiz
+        logger.warning(f"🐢 Giving up on {telegram_id} after FloodWait {e.seconds}s")
+        try:
+            await release_accounts([telegram_id])
+        except Exception as release_error:
+            logger.warning(f"⚠️ Release failed for {telegram_id}: {release_error}")
 
     except Exception as e:
         logger.exception(f"❌ Telegram client crashed for {telegram_id}: {e}")
 
     finally:
-        if heartbeat_task:
-            heartbeat_task.cancel()
-        if monitor_task:
-            monitor_task.cancel()
-
-        await asyncio.gather(
-            *( [heartbeat_task] if heartbeat_task else [] ),
-            *( [monitor_task] if monitor_task else [] ),
-            return_exceptions=True,
-        )
-
+        if catch_up_task is not None:
+            catch_up_task.cancel()
+        ALIVE_CLIENTS.discard(telegram_id)
+        LEASES.pop(telegram_id, None)
         ACTIVE_TASKS.pop(telegram_id, None)
+        CLAIM_WAKEUP.set()  # slot bo‘shadi
         logger.info(f"🧹 Cleaned up client for {telegram_id}")
 
 
 async def graceful_shutdown():
-    logger.warning("🛑 Shutting down worker gracefully")
+    """
+    Drain: stop claiming → finish due replies (REPLY_DRAIN_TIMEOUT) →
+    flush trigger stats → disconnect all clients concurrently → release every owned account in
+    ONE backend call, so the next worker claims them within seconds.
+    """
+    logger.warning("🛑 Draining worker")
     SHUTDOWN_EVENT.set()
+    CLAIM_WAKEUP.set()
+
+    await reply_scheduler.drain(REPLY_DRAIN_TIMEOUT)
+    await trigger_stats.flush()
+
+    # drop_client cursor’ni unutadi → avval olib qo‘yamiz
+    final_cursors = cursors.snapshot(ALIVE_CLIENTS)
+    disconnected = await drop_all_clients(DISCONNECT_TIMEOUT)
 
     tasks = list(ACTIVE_TASKS.values())
     for task in tasks:
         task.cancel()
-
     await asyncio.gather(*tasks, return_exceptions=True)
     ACTIVE_TASKS.clear()
+
+    try:
+        released = await release_accounts(cursors=final_cursors)
+        logger.info(
+            f"♻️ Released {len(released)} accounts ({disconnected} clients disconnected)"
+        )
+    except Exception as e:
+        # watchdog baribir bo‘shatadi, faqat sekinroq
+        logger.error(f"❌ Bulk release on shutdown failed: {e}")
+
+    await close_http()
     logger.info("✅ Worker shutdown complete")
 
 
-async def worker_loop():
+def request_shutdown() -> asyncio.Task:
+    global _shutdown_task
+    if _shutdown_task is None:
+        _shutdown_task = asyncio.create_task(graceful_shutdown())
+    return _shutdown_task
+
+
+async def wait_for_claim_signal():
+    """
+    Event-driven claim: returns on a claim event / freed slot, or after
+    the fallback poll interval (short while the event stream is down).
+    """
+    timeout = (
+        CLAIM_FALLBACK_POLL_INTERVAL
+        if claim_stream_connected()
+        else WORKER_POLL_INTERVAL
+    )
+    try:
+        await asyncio.wait_for(CLAIM_WAKEUP.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+    CLAIM_WAKEUP.clear()
+    # burst’dagi eventlarni bitta claim’ga yig‘amiz
+    await asyncio.sleep(CLAIM_DEBOUNCE)
+
+
+# =========================
+# Shard membership (supervisor mode)
+# =========================
+MEMBERSHIP_POLL_TIMEOUT = 5
+
+
+def _next_membership(membership_queue) -> Optional[list[int]]:
+    try:
+        return membership_queue.get(timeout=MEMBERSHIP_POLL_TIMEOUT)
+    except queue.Empty:
+        return None
+
+
+async def hand_off_accounts(telegram_ids: list[int]) -> None:
+    """Accounts we must not run (bucket moved / no capacity): disconnect + release."""
+    final_cursors = cursors.snapshot(telegram_ids)
+    await asyncio.gather(*(drop_client(tid) for tid in telegram_ids))
+    try:
+        released = await release_accounts(telegram_ids, cursors=final_cursors)
+        logger.info(f"🔀 Handed back {len(released)} accounts")
+    except Exception as e:
+        # heartbeat to‘xtadi → CLAIM_STALE_AFTER’dan keyin baribir bo‘shaydi
+        logger.warning(f"⚠️ Hand-off release failed for {telegram_ids}: {e}")
+
+
+async def shard_membership_watcher(membership_queue) -> None:
+    """
+    Applies ring membership pushed by worker/supervisor.py and exits the
+    worker when the supervisor is gone (orphaned processes must not keep
+    accounts).
+    """
+    parent_pid = os.getppid()
+
+    while not SHUTDOWN_EVENT.is_set():
+        members = await asyncio.to_thread(_next_membership, membership_queue)
+
+        if os.getppid() != parent_pid:
+            logger.error("💀 Supervisor is gone, shutting down")
+            request_shutdown()
+            return
+
+        if members is None or not shard.set_members(members):
+            continue
+
+        logger.info(
+            f"🧩 Shard {shard.index}/{list(shard.members)} owns "
+            f"{len(shard.buckets)} buckets"
+        )
+
+        moved = [tid for tid in ACTIVE_TASKS if not shard.owns(tid)]
+        if moved:
+            await hand_off_accounts(moved)
+
+        CLAIM_WAKEUP.set()
+
+
+async def worker_loop(membership_queue=None):
     logger.info(f"🧠 Worker {WORKER_ID} started")
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, _handle_signal)
+    loop.add_signal_handler(signal.SIGINT, _handle_signal)
+
     await reset_stale_workers_on_startup()
+    session_cache.prune()
+
+    if membership_queue is not None:
+        asyncio.create_task(shard_membership_watcher(membership_queue))
+
+    # 🔁 Trigger edits → cache invalidation (bitta so‘rov / sekund)
+    asyncio.create_task(trigger_version_watcher(SHUTDOWN_EVENT))
+    asyncio.create_task(heartbeat_scheduler())
+    asyncio.create_task(liveness_prober(SHUTDOWN_EVENT))
+    asyncio.create_task(reply_scheduler.run(SHUTDOWN_EVENT))
+    asyncio.create_task(claim_event_listener(SHUTDOWN_EVENT, CLAIM_WAKEUP))
+    asyncio.create_task(metrics_reporter(SHUTDOWN_EVENT, METRICS_LOG_INTERVAL))
+    asyncio.create_task(trigger_stats.trigger_stats_flusher(SHUTDOWN_EVENT))
+    asyncio.create_task(admission.run(SHUTDOWN_EVENT, lambda: len(ACTIVE_TASKS)))
 
     while not SHUTDOWN_EVENT.is_set():
         try:
-            if len(ACTIVE_TASKS) >= MAX_ACTIVE_TASKS:
-                await asyncio.sleep(IDLE_SLEEP)
+            # 🎚 faqat bo‘sh joy qancha bo‘lsa, shuncha claim qilamiz
+            free = admission.free_slots(len(ACTIVE_TASKS))
+            if free <= 0:
+                await wait_for_claim_signal()
                 continue
 
-            users = await claim_users_for_worker()
+            users = await claim_users_for_worker(limit=free)
 
             if not users:
-                await asyncio.sleep(IDLE_SLEEP)
+                await wait_for_claim_signal()
                 continue
 
-            for user in users:
-                if len(ACTIVE_TASKS) >= MAX_ACTIVE_TASKS:
-                    break
-
+            # never keep a claim we are not going to start
+            not_started = []
+            for user in warm_up_order(users):
                 telegram_id = user["telegram_id"]
+
                 if telegram_id in ACTIVE_TASKS:
+                    # qayta claim → yangi lease_epoch, aks holda heartbeat rad etiladi
+                    LEASES[telegram_id] = max(
+                        LEASES.get(telegram_id, 0), user.get("lease_epoch", 0)
+                    )
+                    continue
+
+                # claim va rebalance bir vaqtda bo‘lsa / capacity kamaygan bo‘lsa
+                if (
+                    not shard.owns(telegram_id)
+                    or admission.free_slots(len(ACTIVE_TASKS)) <= 0
+                ):
+                    not_started.append(telegram_id)
                     continue
 
                 task = asyncio.create_task(start_client(user))
                 ACTIVE_TASKS[telegram_id] = task
                 logger.info(f"✅ User {telegram_id} claimed")
 
-            await asyncio.sleep(WORKER_POLL_INTERVAL)
+            if not_started:
+                asyncio.create_task(hand_off_accounts(not_started))
+
+            await wait_for_claim_signal()
 
         except Exception as e:
             logger.error(f"❌ Worker loop error: {e}")
             await asyncio.sleep(ERROR_SLEEP)
 
+    await request_shutdown()
+
 
 def _handle_signal():
-    asyncio.create_task(graceful_shutdown())
+    request_shutdown()
+
 
+def run(shard_index: Optional[int] = None, membership_queue=None) -> None:
+    """
+    Entry point. Single-process mode claims every account; supervisor
+    children pass their ring index + membership queue.
+    """
+    if shard_index is not None:
+        shard.assign(shard_index)
+    asyncio.run(worker_loop(membership_queue))
 
-loop = asyncio.get_event_loop()
-loop.add_signal_handler(signal.SIGTERM, _handle_signal)
-loop.add_signal_handler(signal.SIGINT, _handle_signal)
 
 if __name__ == "__main__":
-    asyncio.run(worker_loop())
\ No newline at end of file
+    run()
@@ -0,0 +1,58 @@
+# worker/metrics.py
+"""
+Tiny in-process metrics registry for the worker.
+
+No external exporter: a snapshot is logged every METRICS_LOG_INTERVAL
+seconds, which is enough to read queue depth / pool usage from Railway logs.
+"""
+from __future__ import annotations
+from typing import Callable, Dict
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+# name -> [count, sum, max]
+_timings: Dict[str, list] = {}
+
+
+def inc(name: str, value: float = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name: str, fn: Callable[[], float]) -> None:
+    """Register a callable that is evaluated on every snapshot."""
+    _gauges[name] = fn
+
+
+def observe(name: str, value: float) -> None:
+    t = _timings.setdefault(name, [0, 0.0, 0.0])
+    t[0] += 1
+    t[1] += value
+    t[2] = max(t[2], value)
+
+
+def snapshot() -> Dict[str, float]:
+    data: Dict[str, float] = dict(_counters)
+
+    for name, fn in _gauges.items():
+        try:
+            data[name] = fn()
+        except Exception:
+            continue
+
+    for name, (count, total, peak) in _timings.items():
+        data[f"{name}.count"] = count
+        data[f"{name}.avg"] = round(total / count, 4) if count else 0.0
+        data[f"{name}.max"] = round(peak, 4)
+
+    return data
+
+
+async def metrics_reporter(shutdown: asyncio.Event, interval: float) -> None:
+    while not shutdown.is_set():
+        await asyncio.sleep(interval)
+        stats = " ".join(f"{k}={v}" for k, v in sorted(snapshot().items()))
+        logger.info(f"📈 metrics {stats}")
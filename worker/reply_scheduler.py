@@ -0,0 +1,292 @@
+# worker/reply_scheduler.py
+"""
+Delayed trigger replies without holding the Telethon event handler.
+
+Matched messages are pushed into a min-heap keyed by send time; one runner
+task per process pops due replies and sends them with bounded concurrency.
+Only the peer, message id and reply text are kept — never the event object.
+"""
+from __future__ import annotations
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+
+from telethon.errors import (
+    AuthKeyUnregisteredError,
+    SessionRevokedError,
+    UnauthorizedError,
+)
+
+from worker import metrics, trigger_stats
+from worker.config import (
+    REPLY_QUEUE_MAX,
+    REPLY_MAX_PER_USER,
+    REPLY_SEND_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PendingReply:
+    __slots__ = (
+        "telegram_id",
+        "chat_id",
+        "client",
+        "peer",
+        "reply_to",
+        "text",
+        "received_at",
+        "due_at",
+        "on_revoked",
+        "trigger_id",
+        "cancelled",
+    )
+
+    def __init__(
+        self,
+        telegram_id: int,
+        chat_id: int,
+        client,
+        peer,
+        reply_to: int,
+        text: str,
+        received_at: float,
+        due_at: float,
+        on_revoked: Optional[Callable[[int], Awaitable[None]]] = None,
+        trigger_id: Optional[int] = None,
+    ) -> None:
+        self.telegram_id = telegram_id
+        self.chat_id = chat_id
+        self.client = client
+        self.peer = peer
+        self.reply_to = reply_to
+        self.text = text
+        self.received_at = received_at
+        self.due_at = due_at
+        self.on_revoked = on_revoked
+        self.trigger_id = trigger_id
+        self.cancelled = False
+
+
+class ReplyScheduler:
+    def __init__(
+        self,
+        max_queue: int = REPLY_QUEUE_MAX,
+        max_per_user: int = REPLY_MAX_PER_USER,
+        send_concurrency: int = REPLY_SEND_CONCURRENCY,
+    ) -> None:
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+
+        self._heap: List[Tuple[float, int, PendingReply]] = []
+        self._seq = itertools.count()
+        # (telegram_id, chat_id) -> pending reply (one per chat: coalescing)
+        self._by_chat: Dict[Tuple[int, int], PendingReply] = {}
+        self._per_user: Dict[int, int] = {}
+
+        self._wakeup = asyncio.Event()
+        self._send_slots = asyncio.Semaphore(send_concurrency)
+        self._sending: set[asyncio.Task] = set()
+        self._draining = False
+
+        metrics.gauge("reply.queue_depth", lambda: len(self._by_chat))
+        metrics.gauge("reply.sending", lambda: len(self._sending))
+
+    # ----------------------------
+    #   producer side
+    # ----------------------------
+
+    def schedule(
+        self,
+        telegram_id: int,
+        chat_id: int,
+        client,
+        peer,
+        reply_to: int,
+        text: str,
+        delay: float,
+        on_revoked: Optional[Callable[[int], Awaitable[None]]] = None,
+        trigger_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Queue a reply. Returns False when it was coalesced or dropped.
+        """
+        key = (telegram_id, chat_id)
+
+        if self._draining:
+            metrics.inc("reply.dropped_draining")
+            return False
+
+        # 🔁 Shu chatga javob allaqachon navbatda → bittasi yetarli
+        if key in self._by_chat:
+            metrics.inc("reply.coalesced")
+            return False
+
+        if len(self._by_chat) >= self.max_queue:
+            metrics.inc("reply.dropped_queue_full")
+            logger.warning(f"⚠️ Reply queue full, dropping reply for {telegram_id}")
+            return False
+
+        if self._per_user.get(telegram_id, 0) >= self.max_per_user:
+            metrics.inc("reply.dropped_user_limit")
+            return False
+
+        now = asyncio.get_running_loop().time()
+        item = PendingReply(
+            telegram_id=telegram_id,
+            chat_id=chat_id,
+            client=client,
+            peer=peer,
+            reply_to=reply_to,
+            text=text,
+            received_at=now,
+            due_at=now + delay,
+            on_revoked=on_revoked,
+            trigger_id=trigger_id,
+        )
+
+        self._by_chat[key] = item
+        self._per_user[telegram_id] = self._per_user.get(telegram_id, 0) + 1
+        heapq.heappush(self._heap, (item.due_at, next(self._seq), item))
+        metrics.inc("reply.scheduled")
+
+        # new earliest deadline → wake the runner
+        if self._heap[0][2] is item:
+            self._wakeup.set()
+        return True
+
+    def has_pending(self, telegram_id: int, chat_id: int) -> bool:
+        return (telegram_id, chat_id) in self._by_chat
+
+    def cancel_user(self, telegram_id: int) -> int:
+        """Cancel every pending reply of an account (revoked / dropped)."""
+        cancelled = 0
+        for key, item in list(self._by_chat.items()):
+            if key[0] != telegram_id:
+                continue
+            item.cancelled = True
+            self._forget(item)
+            cancelled += 1
+
+        if cancelled:
+            metrics.inc("reply.cancelled", cancelled)
+        return cancelled
+
+    def _forget(self, item: PendingReply) -> None:
+        self._by_chat.pop((item.telegram_id, item.chat_id), None)
+
+        left = self._per_user.get(item.telegram_id, 0) - 1
+        if left > 0:
+            self._per_user[item.telegram_id] = left
+        else:
+            self._per_user.pop(item.telegram_id, None)
+
+    # ----------------------------
+    #   runner side
+    # ----------------------------
+
+    async def _dispatch_due(self, now: float) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            _, _, item = heapq.heappop(self._heap)
+            if item.cancelled:
+                continue
+            self._forget(item)
+
+            await self._send_slots.acquire()
+            task = asyncio.create_task(self._send(item))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def run(self, shutdown: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+
+        while not shutdown.is_set():
+            self._wakeup.clear()
+
+            await self._dispatch_due(loop.time())
+
+            timeout = 1.0
+            if self._heap:
+                timeout = max(0.0, min(timeout, self._heap[0][0] - loop.time()))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Shutdown: stop accepting replies, send the ones that come due
+        within `timeout`, drop the rest. Returns the number dropped.
+        """
+        loop = asyncio.get_running_loop()
+        self._draining = True
+        deadline = loop.time() + timeout
+
+        while self._heap and self._heap[0][0] <= deadline:
+            await self._dispatch_due(loop.time())
+            if self._heap:
+                await asyncio.sleep(
+                    max(0.0, min(self._heap[0][0], deadline) - loop.time())
+                )
+
+        dropped = len(self._by_chat)
+        for item in list(self._by_chat.values()):
+            item.cancelled = True
+            self._forget(item)
+        self._heap.clear()
+
+        if self._sending:
+            _, pending = await asyncio.wait(
+                set(self._sending), timeout=max(0.0, deadline - loop.time())
+            )
+            for task in pending:
+                task.cancel()
+            dropped += len(pending)
+
+        if dropped:
+            metrics.inc("reply.dropped_draining", dropped)
+            logger.warning(f"⚠️ Drain deadline: {dropped} replies not sent")
+        return dropped
+
+    async def _send(self, item: PendingReply) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await item.client.send_message(
+                item.peer,
+                item.text,
+                reply_to=item.reply_to,
+            )
+
+            sent_at = loop.time()
+            metrics.inc("reply.sent")
+            metrics.observe("reply.send_latency", sent_at - item.received_at)
+            metrics.observe("reply.lateness", sent_at - item.due_at)
+            trigger_stats.record_reply(item.trigger_id, sent_at - item.received_at)
+            logger.info(
+                f"✅ Reply sent for {item.telegram_id} after "
+                f"{sent_at - item.received_at:.2f}s delay"
+            )
+
+        except (AuthKeyUnregisteredError, SessionRevokedError, UnauthorizedError):
+            logger.warning(
+                f"🔌 Session revoked while replying for {item.telegram_id}"
+            )
+            metrics.inc("reply.failed")
+            self.cancel_user(item.telegram_id)
+            if item.on_revoked is not None:
+                await item.on_revoked(item.telegram_id)
+
+        except Exception as e:
+            metrics.inc("reply.failed")
+            logger.error(
+                f"⚠️ Failed to send reply for {item.telegram_id}: {repr(e)}"
+            )
+
+        finally:
+            self._send_slots.release()
+
+
+reply_scheduler = ReplyScheduler()
@@ -0,0 +1,120 @@
+# worker/session_cache.py
+"""
+Optional local Telethon session store (SESSION_CACHE_DIR).
+
+The DB only keeps a StringSession (DC + auth key). A StringSession client
+starts with an empty entity cache and no update state, so every reclaim
+re-resolves peers and cannot catch up cheaply. With SESSION_CACHE_DIR set,
+each account gets a SQLiteSession file keyed by the session fingerprint
+(sha256 of the session string): entities and update state survive
+reconnects and worker restarts on the same host / volume.
+
+A re-login produces a new session string → new fingerprint → new file,
+so a stale cache can never be used with a different auth key.
+Files contain the auth key: the directory is created with mode 0700.
+"""
+from typing import Optional
+import hashlib
+import logging
+import os
+import time
+
+from telethon.sessions import Session, SQLiteSession, StringSession
+
+from worker.config import (
+    SESSION_CACHE_DIR,
+    SESSION_CACHE_MAX_AGE,
+    SESSION_CACHE_MAX_FILES,
+)
+from worker import metrics
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".session"
+
+
+def fingerprint(session_string: str) -> str:
+    return hashlib.sha256(session_string.encode()).hexdigest()[:32]
+
+
+def _path(fp: str) -> str:
+    return os.path.join(SESSION_CACHE_DIR, fp + SUFFIX)
+
+
+def open_session(session_string: str) -> Session:
+    """StringSession when the cache is off, otherwise a cached SQLiteSession."""
+    if not SESSION_CACHE_DIR:
+        return StringSession(session_string)
+
+    try:
+        os.makedirs(SESSION_CACHE_DIR, mode=0o700, exist_ok=True)
+        path = _path(fingerprint(session_string))
+        hit = os.path.exists(path)
+
+        session = SQLiteSession(path)
+        if hit and session.auth_key is not None:
+            metrics.inc("session_cache.hit")
+            os.utime(path)
+            return session
+
+        # 🆕 birinchi marta: DB’dagi string’dan DC + auth key ko‘chiramiz
+        source = StringSession(session_string)
+        session.set_dc(source.dc_id, source.server_address, source.port)
+        session.auth_key = source.auth_key
+        session.save()
+        metrics.inc("session_cache.miss")
+        return session
+
+    except Exception as e:
+        # kesh ixtiyoriy: muammo bo‘lsa oddiy StringSession
+        logger.warning(f"⚠️ Session cache unavailable, using StringSession: {e!r}")
+        metrics.inc("session_cache.error")
+        return StringSession(session_string)
+
+
+def forget(fp: Optional[str]) -> None:
+    """Revoked session: the auth key is dead, drop its cache file."""
+    if not SESSION_CACHE_DIR or not fp:
+        return
+    path = _path(fp)
+    for p in (path, path + "-journal"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to remove session cache {p}: {e}")
+
+
+def prune() -> int:
+    """
+    Keep only recently owned accounts: drop files older than
+    SESSION_CACHE_MAX_AGE and the oldest beyond SESSION_CACHE_MAX_FILES.
+    """
+    if not SESSION_CACHE_DIR or not os.path.isdir(SESSION_CACHE_DIR):
+        return 0
+
+    files = []
+    for name in os.listdir(SESSION_CACHE_DIR):
+        if not name.endswith(SUFFIX):
+            continue
+        path = os.path.join(SESSION_CACHE_DIR, name)
+        try:
+            files.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+
+    files.sort(reverse=True)
+    cutoff = time.time() - SESSION_CACHE_MAX_AGE
+    stale = [p for i, (mtime, p) in enumerate(files)
+             if mtime < cutoff or i >= SESSION_CACHE_MAX_FILES]
+
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if stale:
+        logger.info(f"🧹 Pruned {len(stale)} cached sessions")
+    return len(stale)
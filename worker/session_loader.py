@@ -1,41 +1,114 @@
 # worker/session_loader.py
+from typing import Optional
+import asyncio
 import httpx
 import logging
+import random
 
-from worker.config import BACKEND_URL
-from worker.config import WORKER_ID, MAX_CLIENTS
+from worker import metrics
+from worker.backend_client import backend_request, get_http
+from worker.config import BACKEND_URL, HTTP_TIMEOUT
+from worker.config import WORKER_ID, MAX_CLIENTS, CLAIM_STREAM_READ_TIMEOUT
+from worker.sharding import shard
 
 logger = logging.getLogger(__name__)
 
-async def claim_users_for_worker():
-    logger.info(f"🔗 Worker attempting to reach backend at: {BACKEND_URL}")
+_claim_stream_connected = False
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        # ---- Preflight health check (DNS + connectivity validation)
-        try:
-            health = await client.get(f"{BACKEND_URL}/health")
-            logger.info(f"💚 Backend health check OK ({health.status_code})")
-        except Exception as e:
-            logger.error(f"❌ Backend health check failed: {repr(e)}")
-            return []
 
-        # ---- Claim users
+def claim_stream_connected() -> bool:
+    return _claim_stream_connected
+
+
+async def claim_users_for_worker(limit: int = MAX_CLIENTS):
+    logger.debug(f"🔗 Worker attempting to reach backend at: {BACKEND_URL}")
+
+    # sharded process with no buckets yet → nothing is ours
+    if limit <= 0 or (shard.sharded and not shard.buckets):
+        return []
+
+    # ---- Claim users
+    try:
+        res = await backend_request(
+            "POST",
+            "/api/users/claim",
+            params={"limit": min(limit, MAX_CLIENTS), **shard.claim_params()},
+            headers={"X-Worker-ID": WORKER_ID},
+        )
+        res.raise_for_status()
+        return res.json()
+
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"❌ Backend responded with error "
+            f"{e.response.status_code}: {e.response.text}"
+        )
+        return []
+
+    except Exception as e:
+        logger.error(f"❌ Claim users failed: {repr(e)}")
+        return []
+
+
+async def report_session_revoked(telegram_id: int) -> None:
+    # ikkalasini ham uramiz: session + worker status
+    await backend_request("POST", f"/api/users/session-revoked/{telegram_id}")
+    await backend_request("POST", f"/api/users/worker-disconnected/{telegram_id}")
+
+
+async def release_accounts(
+    telegram_ids: Optional[list[int]] = None,
+    cursors: Optional[dict[int, int]] = None,
+) -> list[int]:
+    """Hand accounts back to the pool (None → everything this worker owns)."""
+    res = await backend_request(
+        "POST",
+        "/api/users/release",
+        json={
+            "worker_id": WORKER_ID,
+            "telegram_ids": telegram_ids,
+            "cursors": cursors or {},
+        },
+        retry_unsafe=True,
+    )
+    res.raise_for_status()
+    return res.json().get("released", [])
+
+
+async def claim_event_listener(shutdown: asyncio.Event, wakeup: asyncio.Event) -> None:
+    """
+    Long-lived SSE stream (backend LISTEN/NOTIFY): wakes the claim loop as
+    soon as a user becomes claimable. Polling stays only as a fallback.
+    """
+    global _claim_stream_connected
+    backoff = 1.0
+
+    while not shutdown.is_set():
         try:
-            res = await client.post(
-                f"{BACKEND_URL}/api/users/claim",
-                params={"limit": MAX_CLIENTS},
+            async with get_http().stream(
+                "GET",
+                "/api/events/claims",
                 headers={"X-Worker-ID": WORKER_ID},
-            )
-            res.raise_for_status()
-            return res.json()
+                timeout=httpx.Timeout(HTTP_TIMEOUT, read=CLAIM_STREAM_READ_TIMEOUT),
+            ) as res:
+                res.raise_for_status()
+                logger.info("📡 Claim event stream connected")
+                _claim_stream_connected = True
+                backoff = 1.0
+
+                # uzilish paytida o‘tkazib yuborilgan eventlar uchun
+                wakeup.set()
 
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"❌ Backend responded with error "
-                f"{e.response.status_code}: {e.response.text}"
-            )
-            return []
+                async for line in res.aiter_lines():
+                    if line.startswith("event: claimable"):
+                        metrics.inc("claims.events")
+                        wakeup.set()
 
         except Exception as e:
-            logger.error(f"❌ Claim users failed: {repr(e)}")
-            return []
\ No newline at end of file
+            logger.warning(f"⚠️ Claim event stream error: {repr(e)}")
+
+        finally:
+            _claim_stream_connected = False
+
+        await asyncio.sleep(backoff + random.uniform(0, backoff))
+        backoff = min(backoff * 2, 60)
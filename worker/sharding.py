@@ -0,0 +1,88 @@
+# worker/sharding.py
+"""
+Consistent-hash account placement for multi-process workers.
+
+Accounts are grouped into SHARD_BUCKETS fixed buckets (telegram_id % N),
+and buckets are placed on a hash ring of worker processes. When a
+process dies or joins only ~1/N of the buckets move, so most accounts
+stay connected where they are.
+"""
+from typing import Iterable, Optional
+import bisect
+import hashlib
+
+from worker.config import SHARD_BUCKETS, SHARD_VNODES
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def bucket_of(telegram_id: int) -> int:
+    # backend claim query bilan bir xil formula (telegram_id % bucket_count)
+    return telegram_id % SHARD_BUCKETS
+
+
+class HashRing:
+    def __init__(self, members: Iterable[int], vnodes: int = SHARD_VNODES) -> None:
+        points = sorted(
+            (_hash(f"shard-{member}#{v}"), member)
+            for member in set(members)
+            for v in range(vnodes)
+        )
+        self._keys = [p for p, _ in points]
+        self._members = [m for _, m in points]
+
+    def owner(self, bucket: int) -> Optional[int]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(f"bucket-{bucket}")) % len(self._keys)
+        return self._members[i]
+
+    def buckets_for(self, member: int) -> frozenset[int]:
+        return frozenset(b for b in range(SHARD_BUCKETS) if self.owner(b) == member)
+
+
+class ShardState:
+    """
+    This process's view of the ring. index=None → single-process mode,
+    every bucket is ours and claims are not filtered.
+    """
+
+    def __init__(self) -> None:
+        self.index: Optional[int] = None
+        self.members: tuple[int, ...] = ()
+        self.buckets: Optional[frozenset[int]] = None
+
+    def assign(self, index: int) -> None:
+        # membership kelguncha hech narsa claim qilmaymiz
+        self.index = index
+        self.members = ()
+        self.buckets = frozenset()
+
+    @property
+    def sharded(self) -> bool:
+        return self.index is not None
+
+    def set_members(self, members: Iterable[int]) -> bool:
+        """Returns True when our bucket set changed."""
+        members = tuple(sorted(set(members)))
+        if not self.sharded or members == self.members:
+            return False
+
+        self.members = members
+        buckets = HashRing(members).buckets_for(self.index)
+        changed = buckets != self.buckets
+        self.buckets = buckets
+        return changed
+
+    def owns(self, telegram_id: int) -> bool:
+        return self.buckets is None or bucket_of(telegram_id) in self.buckets
+
+    def claim_params(self) -> dict:
+        if self.buckets is None:
+            return {}
+        return {"buckets": sorted(self.buckets), "bucket_count": SHARD_BUCKETS}
+
+
+shard = ShardState()
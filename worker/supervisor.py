@@ -0,0 +1,190 @@
+# worker/supervisor.py
+"""
+Multi-process worker runtime: one worker process per core.
+
+    python -m worker.supervisor            # WORKER_PROCESSES (default: cpu count)
+
+Every child is a normal worker (worker.main.run) with its own WORKER_ID
+("<WORKER_ID>-<index>") and a ring index. The supervisor pushes the set
+of live indexes to every child; children map buckets onto the ring
+(worker/sharding.py) and only claim / keep accounts in their own
+buckets. When a child dies its accounts are released right away and the
+survivors rebalance; the child is respawned with backoff on a fresh
+membership queue and rejoins.
+"""
+import logging
+import multiprocessing as mp
+import os
+import signal
+import time
+
+import httpx
+
+from worker.config import (
+    BACKEND_URL,
+    HTTP_TIMEOUT,
+    SUPERVISOR_RESPAWN_BACKOFF,
+    WORKER_ID,
+    WORKER_PROCESSES,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TICK = 1.0
+STOP_TIMEOUT = 30
+MAX_RESPAWN_BACKOFF = 60
+
+_ctx = mp.get_context("spawn")
+
+
+def _child_main(index: int, membership_queue) -> None:
+    from worker.main import run
+
+    run(shard_index=index, membership_queue=membership_queue)
+
+
+class Supervisor:
+    def __init__(self, processes: int) -> None:
+        self.processes = processes
+        self.procs: dict[int, mp.Process] = {}
+        self.queues: dict[int, mp.Queue] = {}
+        self.members: set[int] = set()
+        self.respawn_at: dict[int, float] = {}
+        self.backoff: dict[int, float] = {}
+        self.started_at: dict[int, float] = {}
+        self.stopping = False
+
+    @staticmethod
+    def worker_id(index: int) -> str:
+        return f"{WORKER_ID}-{index}"
+
+    def _fresh_queue(self, index: int) -> mp.Queue:
+        old = self.queues.get(index)
+        if old is not None:
+            # o‘lik child get() ichida lock’ni ushlab qolgan bo‘lishi mumkin.
+            # membership har safar to‘liq yuboriladi → eski navbatda yo‘qotadigan narsa yo‘q
+            old.cancel_join_thread()
+            old.close()
+        self.queues[index] = _ctx.Queue()
+        return self.queues[index]
+
+    def spawn(self, index: int) -> None:
+        membership_queue = self._fresh_queue(index)
+
+        # spawn child worker.config’ni o‘zining WORKER_ID’si bilan import qiladi
+        previous = os.environ.get("WORKER_ID")
+        os.environ["WORKER_ID"] = self.worker_id(index)
+        try:
+            proc = _ctx.Process(
+                target=_child_main,
+                args=(index, membership_queue),
+                name=f"worker-{index}",
+            )
+            proc.start()
+        finally:
+            if previous is None:
+                os.environ.pop("WORKER_ID", None)
+            else:
+                os.environ["WORKER_ID"] = previous
+
+        self.procs[index] = proc
+        self.started_at[index] = time.monotonic()
+        self.members.add(index)
+        logger.info(f"🐣 Worker process {index} started (pid={proc.pid})")
+
+    def broadcast(self) -> None:
+        members = sorted(self.members)
+        for index in members:
+            try:
+                self.queues[index].put_nowait(members)
+            except Exception as e:
+                logger.warning(f"⚠️ Membership push to {index} failed: {e}")
+        logger.info(f"🧩 Ring members: {members}")
+
+    def release(self, index: int) -> None:
+        """Dead child → its accounts are claimable now, not after the stale timeout."""
+        try:
+            res = httpx.post(
+                f"{BACKEND_URL}/api/users/release",
+                json={"worker_id": self.worker_id(index), "telegram_ids": None},
+                timeout=HTTP_TIMEOUT,
+            )
+            res.raise_for_status()
+            logger.info(
+                f"♻️ Released {len(res.json().get('released', []))} accounts of worker {index}"
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Release for dead worker {index} failed: {e}")
+
+    def reap(self) -> bool:
+        changed = False
+        for index, proc in list(self.procs.items()):
+            if proc.is_alive():
+                continue
+
+            self.procs.pop(index)
+            self.members.discard(index)
+            changed = True
+            logger.error(f"💀 Worker process {index} exited (code={proc.exitcode})")
+            self.release(index)
+
+            if not self.stopping:
+                delay = self.backoff.get(index, SUPERVISOR_RESPAWN_BACKOFF)
+                self.respawn_at[index] = time.monotonic() + delay
+                self.backoff[index] = min(delay * 2, MAX_RESPAWN_BACKOFF)
+        return changed
+
+    def respawn_due(self) -> bool:
+        now = time.monotonic()
+        due = [i for i, at in self.respawn_at.items() if at <= now]
+        for index in due:
+            self.respawn_at.pop(index)
+            self.spawn(index)
+        return bool(due)
+
+    def stop(self, *_):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.warning("🛑 Supervisor stopping workers")
+        for proc in self.procs.values():
+            if proc.is_alive():
+                proc.terminate()  # SIGTERM → worker graceful_shutdown
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.processes):
+            self.spawn(index)
+        self.broadcast()
+
+        while not self.stopping:
+            changed = self.reap()
+            changed = self.respawn_due() or changed
+            if changed:
+                self.broadcast()
+
+            # uzoq yashagan process → backoff reset
+            now = time.monotonic()
+            for index in self.procs:
+                if now - self.started_at[index] > MAX_RESPAWN_BACKOFF:
+                    self.backoff.pop(index, None)
+
+            time.sleep(TICK)
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for index, proc in self.procs.items():
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                logger.error(f"⏱ Worker process {index} did not stop, killing")
+                proc.kill()
+                proc.join()
+                self.release(index)
+
+        logger.info("✅ Supervisor stopped")
+
+
+if __name__ == "__main__":
+    Supervisor(max(1, WORKER_PROCESSES)).run()
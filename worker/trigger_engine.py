@@ -1,14 +1,22 @@
 # worker/trigger_engine.py
 
-import httpx
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 import re
 import asyncio
 import logging
 import random
 from telethon import events
-from telethon.errors import AuthKeyUnregisteredError, SessionRevokedError
 
-from worker.config import BACKEND_URL
+from worker.backend_client import backend_request
+from worker.config import (
+    WORKER_ID,
+    TRIGGER_CACHE_TTL,
+    TRIGGER_VERSION_POLL_INTERVAL,
+)
+from worker import cursors, metrics, trigger_stats
+from worker.dedup import dedup
+from worker.reply_scheduler import reply_scheduler
+from worker.utils import TTLCache
 
 
 
@@ -16,108 +24,264 @@ logger = logging.getLogger(__name__)
 
 # NOTE: We must NOT remove spaces for trigger matching.
 # Using normalize_text() here can break word-boundary regex (e.g. "hi bro" -> "hibro").
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9_]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
 def _prep_text(s: str) -> str:
     # lower + trim + collapse multiple spaces, but keep word boundaries
     s = s.lower().strip()
-    s = re.sub(r"\s+", " ", s)
+    s = _SPACES_RE.sub(" ", s)
     return s
 
 def _tokenize(s: str) -> list[str]:
     # split text into words, ignoring punctuation
-    return re.findall(r"[a-zA-Z0-9_]+", s.lower())
+    return _TOKEN_RE.findall(s.lower())
 
 
-async def handle_incoming_message(
-    client,
-    event: events.NewMessage.Event,
-    telegram_id: int,
-):
-    # ❌ Ignore group, supergroup, and channel messages (private chats only for now)
-    if event.is_group or event.is_channel:
-        return
+class _TrieNode:
+    __slots__ = ("children", "hit")
 
-    # ❌ Ignore messages sent by the account itself (double safety)
-    if event.out or (event.sender_id == telegram_id):
-        return
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        # (priority, trigger) of the earliest trigger ending at this node
+        self.hit: Optional[Tuple[int, dict]] = None
 
-    if not event.message or not event.message.text:
-        return
 
-    raw_text = event.message.text
-    text = _prep_text(raw_text)
-    logger.debug(f"📩 Incoming message for {telegram_id}: {text}")
+class TriggerMatcher:
+    """
+    Compiled trigger set of ONE user.
+
+    Triggers are tokenized once and stored in a token trie, so a message is
+    tokenized once and matched by walking its leading tokens only.
+    Semantics are the same as the old linear scan: trigger tokens must be a
+    prefix of the message tokens, and the first trigger (backend order) wins.
+    """
+
+    def __init__(self, triggers: list[dict]) -> None:
+        self.size = 0
+        self._root = _TrieNode()
+
+        for priority, t in enumerate(triggers):
+            if not t.get("trigger_text") or not t.get("reply_text"):
+                continue
+
+            node = self._root
+            for token in _tokenize(_prep_text(t["trigger_text"])):
+                node = node.children.setdefault(token, _TrieNode())
+
+            if node.hit is None or priority < node.hit[0]:
+                node.hit = (priority, t)
+            self.size += 1
+
+    def match(self, tokens: list[str]) -> Optional[dict]:
+        best = self._root.hit
+        node = self._root
+
+        for token in tokens:
+            node = node.children.get(token)
+            if node is None:
+                break
+            if node.hit is not None and (best is None or node.hit[0] < best[0]):
+                best = node.hit
+
+        return best[1] if best else None
+
+
+# user telegram_id -> (source signature, compiled matcher)
+_matchers: Dict[int, Tuple[tuple, TriggerMatcher]] = {}
+
+
+def get_matcher(telegram_id: int, triggers: list[dict]) -> TriggerMatcher:
+    """
+    Return the compiled matcher for a user, recompiling only when
+    the trigger set actually changed.
+    """
+    signature = tuple(
+        (t.get("id"), t.get("trigger_text"), t.get("reply_text"))
+        for t in triggers
+    )
+    cached = _matchers.get(telegram_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    matcher = TriggerMatcher(triggers)
+    _matchers[telegram_id] = (signature, matcher)
+    return matcher
+
+
+# ============================
+#     TRIGGER CACHE
+# ============================
+
+# str(telegram_id) -> (triggers_version at load time, matcher)
+_trigger_cache: TTLCache[Tuple[Optional[int], TriggerMatcher]] = TTLCache(TRIGGER_CACHE_TTL)
+
+# telegram_id -> latest triggers_version reported by backend
+_versions: Dict[int, int] = {}
+
 
-    # 🔁 triggerlarni backenddan olish
-    async with httpx.AsyncClient(timeout=10) as http:
+def forget_matcher(telegram_id: int) -> None:
+    _matchers.pop(telegram_id, None)
+    _trigger_cache.pop(str(telegram_id))
+    _versions.pop(telegram_id, None)
+
+
+async def load_matcher(telegram_id: int) -> Optional[TriggerMatcher]:
+    """
+    Cached matcher for a user. Backend is hit only when the cached entry
+    expired (TRIGGER_CACHE_TTL) or the user's triggers_version changed.
+    """
+    key = str(telegram_id)
+    version = _versions.get(telegram_id)
+
+    cached = _trigger_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    try:
+        res = await backend_request(
+            "GET",
+            "/api/triggers/",
+            params={"user_telegram_id": telegram_id},
+        )
+        res.raise_for_status()
+        triggers = res.json()
+    except Exception as e:
+        logger.error(f"❌ Failed to load triggers for {telegram_id}: {e}")
+        return None
+
+    matcher = get_matcher(telegram_id, triggers)
+    _trigger_cache.set(key, (version, matcher))
+    return matcher
+
+
+async def trigger_version_watcher(shutdown: asyncio.Event) -> None:
+    """
+    One request per worker per interval: picks up trigger edits
+    of all owned users without polling on every message.
+    """
+    while not shutdown.is_set():
         try:
-            res = await http.get(
-                f"{BACKEND_URL}/api/triggers/",
-                params={"user_telegram_id": telegram_id},
+            res = await backend_request(
+                "GET",
+                "/api/triggers/versions",
+                headers={"X-Worker-ID": WORKER_ID},
             )
             res.raise_for_status()
-            triggers = res.json()
+            versions = {int(k): v for k, v in res.json().items()}
+
+            _versions.clear()
+            _versions.update(versions)
         except Exception as e:
-            logger.error(f"❌ Failed to load triggers for {telegram_id}: {e}")
-            return
+            logger.warning(f"⚠️ Trigger version poll failed: {e}")
 
-    if not triggers:
-        return
+        await asyncio.sleep(TRIGGER_VERSION_POLL_INTERVAL)
 
-    for t in triggers:
-        trigger_text = t.get("trigger_text")
-        reply_text = t.get("reply_text")
 
-        if not trigger_text or not reply_text:
-            continue
+async def process_message(
+    client,
+    telegram_id: int,
+    chat_id: int,
+    message_id: int,
+    raw_text: str,
+    resolve_peer: Callable[[], Awaitable],
+    on_revoked: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> bool:
+    """
+    Shared by live events and catch-up: dedup → match → schedule → cursor.
+    Returns True when a reply was scheduled.
 
-        trigger_norm = _prep_text(trigger_text)
-        trigger_tokens = _tokenize(trigger_norm)
-        message_tokens = _tokenize(text)
+    The message counts as handled (cursor advanced, dedup kept) once it
+    did not match or its reply is queued. A trigger load / peer failure
+    or a dropped reply releases it, so catch-up or a replay can retry.
+    """
+    # 🔁 oldingi owner allaqachon ko‘rgan (reconnect replay)
+    if cursors.below_floor(telegram_id, message_id):
+        metrics.inc("dedup.below_cursor")
+        return False
 
-        # 🔒 Trigger must be at the START of the message
-        if len(message_tokens) < len(trigger_tokens):
-            continue
+    # 🔁 duplicated update / catch-up + live overlap
+    # (bu yerda band qilamiz: parallel live + catch-up ikki marta javob bermasin)
+    if dedup.seen(telegram_id, chat_id, message_id):
+        return False
 
-        if message_tokens[:len(trigger_tokens)] != trigger_tokens:
-            continue
+    text = _prep_text(raw_text)
+    logger.debug(f"📩 Incoming message for {telegram_id}: {text}")
 
-        try:
-            logger.info(f"🎯 Trigger matched for {telegram_id}: {trigger_text}")
+    # 🔁 triggerlar cache’dan (backend faqat versiya o‘zgarganda)
+    matcher = await load_matcher(telegram_id)
+    if matcher is None:
+        dedup.release(telegram_id, chat_id, message_id)
+        return False
 
-            # ⏱ Human-like random delay (SAFE: does NOT touch entities or typing)
-            delay = random.uniform(5.0, 10.0)
-            await asyncio.sleep(delay)
+    # 🔒 Trigger must be at the START of the message (token prefix match)
+    t = matcher.match(_tokenize(text)) if matcher.size else None
+    if t is None:
+        cursors.advance(telegram_id, message_id)
+        return False
 
-            await event.reply(reply_text)
+    trigger_text = t["trigger_text"]
+    reply_text = t["reply_text"]
 
-            logger.info(
-                f"✅ Reply sent for {telegram_id} after {delay:.2f}s delay"
-            )
+    logger.info(f"🎯 Trigger matched for {telegram_id}: {trigger_text}")
 
-        # 🔥 🔥 🔥 MANA SIZ SO‘RAGAN KOD JOYI
-        except (AuthKeyUnregisteredError, SessionRevokedError):
-            logger.warning(
-                f"🔌 Session revoked while replying for {telegram_id}"
-            )
+    # ⏱ Human-like random delay (SAFE: does NOT touch entities or typing)
+    # Handler qaytadi, javobni reply_scheduler vaqti kelganda yuboradi
+    try:
+        peer = await resolve_peer()
+    except Exception as e:
+        logger.error(f"⚠️ Failed to resolve chat for {telegram_id}: {repr(e)}")
+        dedup.release(telegram_id, chat_id, message_id)
+        return False
 
-            async with httpx.AsyncClient(timeout=5) as http:
-                await http.post(
-                    f"{BACKEND_URL}/api/users/session-revoked/{telegram_id}"
-                )
-                await http.post(
-                    f"{BACKEND_URL}/api/users/worker-disconnected/{telegram_id}"
-                )
+    scheduled = reply_scheduler.schedule(
+        telegram_id=telegram_id,
+        chat_id=chat_id,
+        client=client,
+        peer=peer,
+        reply_to=message_id,
+        text=reply_text,
+        delay=random.uniform(5.0, 10.0),
+        on_revoked=on_revoked,
+        trigger_id=t.get("id"),
+    )
 
-            try:
-                await client.disconnect()
-            except Exception:
-                pass
+    # 📊 faqat navbatga qo‘yilgan javob hisoblanadi (coalesced / dropped emas)
+    if scheduled:
+        trigger_stats.record_hit(t.get("id"))
 
-            return  # ⛔ shu user uchun trigger ishlashi to‘xtaydi
+    # coalesced → shu chatga javob baribir navbatda, qayta urinish shart emas
+    if scheduled or reply_scheduler.has_pending(telegram_id, chat_id):
+        cursors.advance(telegram_id, message_id)
+    else:
+        dedup.release(telegram_id, chat_id, message_id)
+    return scheduled
 
-        except Exception as e:
-            logger.error(
-                f"⚠️ Failed to send reply for {telegram_id}: {repr(e)}"
-            )
 
-        break
\ No newline at end of file
+async def handle_incoming_message(
+    client,
+    event: events.NewMessage.Event,
+    telegram_id: int,
+    on_revoked: Optional[Callable[[int], Awaitable[None]]] = None,
+):
+    # ❌ Ignore group, supergroup, and channel messages (private chats only for now)
+    if event.is_group or event.is_channel:
+        return
+
+    # ❌ Ignore messages sent by the account itself (double safety)
+    if event.out or (event.sender_id == telegram_id):
+        return
+
+    if not event.message or not event.message.text:
+        return
+
+    await process_message(
+        client,
+        telegram_id,
+        chat_id=event.chat_id,
+        message_id=event.message.id,
+        raw_text=event.message.text,
+        resolve_peer=event.get_input_chat,
+        on_revoked=on_revoked,
+    )
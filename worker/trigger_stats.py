@@ -0,0 +1,113 @@
+# worker/trigger_stats.py
+"""
+Write-behind trigger counters.
+
+The hot path only touches an in-memory dict (record_hit on match,
+record_reply on send). Deltas are flushed every TRIGGER_STATS_FLUSH_INTERVAL
+seconds — and once more on drain — as ONE bulk upsert
+(POST /api/triggers/stats). A failed flush merges its deltas back so
+the next one retries them.
+"""
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import logging
+
+from worker import metrics
+from worker.backend_client import backend_request
+from worker.config import WORKER_ID, TRIGGER_STATS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class _Delta:
+    __slots__ = ("hits", "replies", "last_fired_at", "latency_total_ms", "latency_max_ms")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.replies = 0
+        self.last_fired_at: Optional[datetime] = None
+        self.latency_total_ms = 0
+        self.latency_max_ms = 0
+
+    def merge(self, other: "_Delta") -> None:
+        self.hits += other.hits
+        self.replies += other.replies
+        self.latency_total_ms += other.latency_total_ms
+        self.latency_max_ms = max(self.latency_max_ms, other.latency_max_ms)
+        if other.last_fired_at and (
+            self.last_fired_at is None or other.last_fired_at > self.last_fired_at
+        ):
+            self.last_fired_at = other.last_fired_at
+
+    def as_json(self, trigger_id: int) -> dict:
+        return {
+            "trigger_id": trigger_id,
+            "hits": self.hits,
+            "replies": self.replies,
+            "last_fired_at": self.last_fired_at.isoformat() if self.last_fired_at else None,
+            "latency_total_ms": self.latency_total_ms,
+            "latency_max_ms": self.latency_max_ms,
+        }
+
+
+_pending: Dict[int, _Delta] = {}
+
+metrics.gauge("trigger_stats.pending", lambda: len(_pending))
+
+
+def _delta(trigger_id: int) -> _Delta:
+    d = _pending.get(trigger_id)
+    if d is None:
+        d = _pending[trigger_id] = _Delta()
+    return d
+
+
+def record_hit(trigger_id: Optional[int]) -> None:
+    if trigger_id is None:
+        return
+    d = _delta(trigger_id)
+    d.hits += 1
+    d.last_fired_at = datetime.utcnow()
+
+
+def record_reply(trigger_id: Optional[int], latency: float) -> None:
+    if trigger_id is None:
+        return
+    d = _delta(trigger_id)
+    ms = int(latency * 1000)
+    d.replies += 1
+    d.latency_total_ms += ms
+    d.latency_max_ms = max(d.latency_max_ms, ms)
+
+
+async def flush() -> int:
+    global _pending
+    if not _pending:
+        return 0
+
+    # swap: flush paytida kelgan hit’lar yangi dict’ga tushadi
+    batch, _pending = _pending, {}
+    try:
+        res = await backend_request(
+            "POST",
+            "/api/triggers/stats",
+            json={"stats": [d.as_json(tid) for tid, d in batch.items()]},
+            headers={"X-Worker-ID": WORKER_ID},
+        )
+        res.raise_for_status()
+        metrics.inc("trigger_stats.flushed", len(batch))
+        return len(batch)
+
+    except Exception as e:
+        logger.warning(f"⚠️ Trigger stats flush failed ({len(batch)} triggers): {e}")
+        metrics.inc("trigger_stats.flush_failed")
+        for tid, d in batch.items():
+            _delta(tid).merge(d)
+        return 0
+
+
+async def trigger_stats_flusher(shutdown: asyncio.Event) -> None:
+    while not shutdown.is_set():
+        await asyncio.sleep(TRIGGER_STATS_FLUSH_INTERVAL)
+        await flush()
@@ -2,10 +2,6 @@ from typing import Generic, TypeVar, Optional, Dict, Tuple
 import time
 import re
 
-import signal
-from sqlalchemy import text
-from backend.core.db import engine
-from worker.config import WORKER_ID
 
 T = TypeVar('T')
 
@@ -41,18 +37,7 @@ class TTLCache(Generic[T]):
     def set(self, key: str, value: T) -> None:
         self.store[key] = (value, time.time())
 
+    def pop(self, key: str) -> Optional[T]:
+        item = self.store.pop(key, None)
+        return item[0] if item else None
 
-def release_users():
-    with engine.begin() as conn:
-        conn.execute(text("""
-            UPDATE users
-            SET worker_id = NULL,
-                worker_active = false
-            WHERE worker_id = :worker_id
-        """), {"worker_id": WORKER_ID})
-
-
-def setup_shutdown_hooks():
-    signal.signal(signal.SIGTERM, lambda *_: release_users())
-    signal.signal(signal.SIGINT, lambda *_: release_users())
-    signal.signal(signal.SIGQUIT, lambda *_: release_users())
\ No newline at end of file